@@ -1,42 +1,231 @@
 import asyncio
 import logging
+import multiprocessing
 import os
+import signal
+import socket
+from typing import List, Optional
+
+from aiohttp import web
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.webhook.aiohttp_server import setup_application
 
-from app.db import init_db
+from app.db import close_db, init_db
+from app.handlers.admin import router as admin_router
 from app.handlers.start import router as start_router
 from app.handlers.messages import router as messages_router
 from app.handlers.callbacks import router as callback_router
+from app.services.container import ServiceContainer
+from app.webhook_router import ChatRoutingRequestHandler, get_route_port
 
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
+def setup_logging() -> None:
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        format="%(asctime)s | %(levelname)s | %(processName)s | %(name)s | %(message)s",
         handlers=[
             logging.FileHandler("bot.log", encoding="utf-8"),
             logging.StreamHandler(),
         ],
     )
 
+
+def get_token() -> str:
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise RuntimeError("BOT_TOKEN is not set")
+    return token
+
+
+def create_bot(token: str) -> Bot:
+    # TELEGRAM_API_URL points the bot at a local Bot API server (or a fake
+    # one in load tests) instead of api.telegram.org.
+    api_url = os.getenv("TELEGRAM_API_URL")
+    session = None
+    if api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+    return Bot(token=token, session=session)
 
-    bot = Bot(token=token)
-    dp = Dispatcher()
+
+def create_dispatcher(services: ServiceContainer) -> Dispatcher:
+    dp = Dispatcher(services=services)
     dp.include_router(start_router)
+    dp.include_router(admin_router)
     dp.include_router(messages_router)
     dp.include_router(callback_router)
+    return dp
+
+
+async def run_polling(token: str) -> None:
+    services = ServiceContainer.create()
+    bot = create_bot(token)
+    dp = create_dispatcher(services)
 
     await init_db()
-    await dp.start_polling(bot)
+    await services.start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await services.close()
+        await close_db()
+
+
+def get_webhook_path() -> str:
+    return os.getenv("WEBHOOK_PATH", "/webhook")
+
+
+def get_webhook_secret() -> Optional[str]:
+    return os.getenv("WEBHOOK_SECRET") or None
+
+
+async def prepare_webhook(token: str) -> None:
+    """Create tables and register the webhook once, before workers start."""
+    base_url = os.getenv("WEBHOOK_BASE_URL")
+    if not base_url:
+        raise RuntimeError("WEBHOOK_BASE_URL is not set")
+    await init_db()
+    await close_db()
+    bot = create_bot(token)
+    try:
+        await bot.set_webhook(
+            f"{base_url.rstrip('/')}{get_webhook_path()}",
+            secret_token=get_webhook_secret(),
+        )
+    finally:
+        await bot.session.close()
+    logger.info("Webhook registered: base_url=%s path=%s", base_url, get_webhook_path())
+
+
+async def serve_webhook(token: str, index: int = 0, workers: int = 1) -> None:
+    services = ServiceContainer.create()
+    bot = create_bot(token)
+    dp = create_dispatcher(services)
+    await services.start()
+
+    app = web.Application()
+    # Handlers that return a Telegram method (``/start``, callback answers,
+    # "please wait") are answered in the webhook response itself; LLM turns
+    # are handed to the chat scheduler and return immediately. With several
+    # workers each chat is routed to one of them to keep its turns in order.
+    route_port = get_route_port()
+    ChatRoutingRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        index=index,
+        workers=workers,
+        route_port=route_port,
+        path=get_webhook_path(),
+        secret_token=get_webhook_secret(),
+    ).register(app, path=get_webhook_path())
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    await web.TCPSite(runner, host, port, reuse_port=workers > 1).start()
+    if workers > 1:
+        await web.TCPSite(runner, "127.0.0.1", route_port + index).start()
+    logger.info(
+        "Webhook server started: host=%s port=%s worker=%s pid=%s",
+        host,
+        port,
+        index,
+        os.getpid(),
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no signal handlers; a plain handler
+            # still wakes the loop through call_soon_threadsafe.
+            signal.signal(
+                sig, lambda _signum, _frame: loop.call_soon_threadsafe(stop.set)
+            )
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await services.close()
+        await close_db()
+        logger.info("Webhook server stopped: pid=%s", os.getpid())
+
+
+def _webhook_worker(token: str, index: int, workers: int) -> None:
+    setup_logging()
+    asyncio.run(serve_webhook(token, index=index, workers=workers))
+
+
+def run_webhook(token: str) -> None:
+    workers = int(os.getenv("WEBHOOK_WORKERS", "1"))
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError(
+            "WEBHOOK_WORKERS > 1 needs SO_REUSEPORT, which this platform lacks; "
+            "set WEBHOOK_WORKERS=1"
+        )
+    asyncio.run(prepare_webhook(token))
+    if workers <= 1:
+        asyncio.run(serve_webhook(token))
+        return
+
+    # Workers share the port through SO_REUSEPORT and share state through
+    # the database, so per-process caches must not be trusted blindly.
+    os.environ.setdefault("TICKET_CACHE_MODE", "validate")
+    context = multiprocessing.get_context("spawn")
+    processes: List[multiprocessing.Process] = [
+        context.Process(
+            target=_webhook_worker,
+            args=(token, index, workers),
+            name=f"worker-{index}",
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info("Webhook workers started: count=%s", workers)
+
+    def _stop(_signum, _frame) -> None:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _forward(signum, _frame) -> None:
+        for process in processes:
+            if process.is_alive() and process.pid is not None:
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, _stop)
+    if hasattr(signal, "SIGHUP"):
+        # SIGHUP to the parent reloads the assistant profile in every worker.
+        signal.signal(signal.SIGHUP, _forward)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        _stop(signal.SIGINT, None)
+        for process in processes:
+            process.join()
+
+
+def main() -> None:
+    setup_logging()
+    token = get_token()
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        run_webhook(token)
+    else:
+        asyncio.run(run_polling(token))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,22 +1,36 @@
 from app.db.crud import (
+    TicketUnitOfWork,
     add_ticket_message,
+    add_ticket_messages,
     create_ticket,
     get_open_ticket,
+    get_open_ticket_id,
     get_ticket,
     get_ticket_messages,
+    get_ticket_state,
+    get_ticket_summary,
     get_user_tickets,
+    save_ticket_summary,
     update_ticket_status,
 )
-from app.db.database import get_session, init_db
+from app.db.database import close_db, get_read_session, get_session, init_db
 
 __all__ = [
+    "TicketUnitOfWork",
     "add_ticket_message",
+    "add_ticket_messages",
+    "close_db",
     "create_ticket",
     "get_open_ticket",
+    "get_open_ticket_id",
+    "get_read_session",
     "get_ticket",
     "get_ticket_messages",
+    "get_ticket_state",
+    "get_ticket_summary",
     "get_user_tickets",
     "get_session",
     "init_db",
+    "save_ticket_summary",
     "update_ticket_status",
 ]
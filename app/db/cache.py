@@ -0,0 +1,152 @@
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional
+
+from app.db.models import Ticket, TicketMessage, TicketSummary
+
+
+MODE_LOCAL = "local"
+MODE_VALIDATE = "validate"
+MODE_OFF = "off"
+
+
+@dataclass
+class CachedTicket:
+    user_id: int
+    ticket_id: int
+    messages: Deque[TicketMessage]
+    summary: Optional[TicketSummary] = None
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def last_message_id(self) -> Optional[int]:
+        if not self.messages:
+            return None
+        return self.messages[-1].id
+
+
+class TicketCache:
+    """Write-through cache of each user's open ticket and recent messages.
+
+    Modes:
+    - ``local``: this process is the only writer, cached rows are trusted.
+    - ``validate``: other processes may write; callers confirm an entry with
+      a single index-only query before using it.
+    - ``off``: every lookup goes to the database.
+    """
+
+    def __init__(
+        self,
+        mode: str = MODE_LOCAL,
+        max_users: int = 10_000,
+        idle_seconds: float = 1800,
+        history_size: int = 20,
+    ) -> None:
+        self.mode = mode
+        self.history_size = history_size
+        self._max_users = max_users
+        self._idle = idle_seconds
+        self._entries: "OrderedDict[int, CachedTicket]" = OrderedDict()
+        self._ticket_users: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "TicketCache":
+        return cls(
+            mode=os.getenv("TICKET_CACHE_MODE", MODE_LOCAL),
+            max_users=int(os.getenv("TICKET_CACHE_SIZE", "10000")),
+            idle_seconds=float(os.getenv("TICKET_CACHE_IDLE_SECONDS", "1800")),
+            history_size=int(os.getenv("TICKET_CACHE_HISTORY", "20")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != MODE_OFF
+
+    def get(self, user_id: int, limit: int) -> Optional[CachedTicket]:
+        self._evict_idle()
+        entry = self._entries.get(user_id) if self.enabled else None
+        if entry is None or limit > self.history_size:
+            self.misses += 1
+            return None
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry
+
+    def recent(self, entry: CachedTicket, limit: int) -> List[TicketMessage]:
+        messages = list(entry.messages)
+        return messages[-limit:] if limit else []
+
+    def put(
+        self,
+        user_id: int,
+        ticket_id: int,
+        messages: Iterable[TicketMessage],
+        summary: Optional[TicketSummary] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        self.discard_user(user_id)
+        self._entries[user_id] = CachedTicket(
+            user_id=user_id,
+            ticket_id=ticket_id,
+            messages=deque(messages, maxlen=self.history_size),
+            summary=summary,
+        )
+        self._ticket_users[ticket_id] = user_id
+        while len(self._entries) > self._max_users:
+            _user_id, entry = self._entries.popitem(last=False)
+            self._ticket_users.pop(entry.ticket_id, None)
+
+    def on_ticket_created(self, ticket: Ticket) -> None:
+        if ticket.status == "open":
+            self.put(ticket.user_id, ticket.id, [])
+
+    def on_messages_added(self, messages: Iterable[TicketMessage]) -> None:
+        for message in messages:
+            user_id = self._ticket_users.get(message.ticket_id)
+            entry = self._entries.get(user_id) if user_id is not None else None
+            if entry is not None:
+                entry.messages.append(message)
+
+    def on_summary_updated(self, summary: TicketSummary) -> None:
+        user_id = self._ticket_users.get(summary.ticket_id)
+        entry = self._entries.get(user_id) if user_id is not None else None
+        if entry is not None:
+            entry.summary = summary
+
+    def on_status_changed(self, ticket_id: int, status: str) -> None:
+        if status == "open":
+            return
+        user_id = self._ticket_users.get(ticket_id)
+        if user_id is not None:
+            self.discard_user(user_id)
+
+    def discard_user(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._ticket_users.pop(entry.ticket_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._ticket_users.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "users": len(self._entries)}
+
+    def _evict_idle(self) -> None:
+        if not self._idle:
+            return
+        cutoff = time.monotonic() - self._idle
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry.last_used >= cutoff:
+                break
+            self.discard_user(user_id)
+
+
+ticket_cache = TicketCache.from_env()
@@ -0,0 +1,224 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import get_read_session, get_session
+from app.db.models import ChatState
+
+
+_MISSING = object()
+
+
+class ChatStateStore(Protocol):
+    """Per-chat state that must survive across handlers and processes.
+
+    Currently holds the id of the last bot message that carries the ticket
+    keyboard, so it can be cleared when a newer reply is sent.
+    """
+
+    async def get_keyboard_message(self, chat_id: int) -> Optional[int]: ...
+
+    async def set_keyboard_message(
+        self, chat_id: int, message_id: Optional[int]
+    ) -> None: ...
+
+    async def compare_and_set_keyboard_message(
+        self,
+        chat_id: int,
+        expected: Optional[int],
+        message_id: Optional[int],
+    ) -> bool:
+        """Set ``message_id`` only if the stored value is still ``expected``."""
+        ...
+
+    def stats(self) -> Dict[str, int]: ...
+
+
+class _LruMap:
+    """Bounded chat_id -> value map; least recently used entries go first."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._items: "OrderedDict[int, Optional[int]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, chat_id: int) -> object:
+        value = self._items.get(chat_id, _MISSING)
+        if value is not _MISSING:
+            self._items.move_to_end(chat_id)
+        return value
+
+    def put(self, chat_id: int, value: Optional[int]) -> None:
+        self._items[chat_id] = value
+        self._items.move_to_end(chat_id)
+        while len(self._items) > self._max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, chat_id: int) -> None:
+        self._items.pop(chat_id, None)
+
+
+class MemoryChatStateStore:
+    """Process-local LRU store; only correct with a single bot process.
+
+    Evicted chats simply lose their keyboard pointer, so at worst an old
+    keyboard stays visible.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self._keyboards = _LruMap(max_entries)
+
+    async def get_keyboard_message(self, chat_id: int) -> Optional[int]:
+        value = self._keyboards.get(chat_id)
+        return None if value is _MISSING else value
+
+    async def set_keyboard_message(
+        self, chat_id: int, message_id: Optional[int]
+    ) -> None:
+        self._keyboards.put(chat_id, message_id)
+
+    async def compare_and_set_keyboard_message(
+        self,
+        chat_id: int,
+        expected: Optional[int],
+        message_id: Optional[int],
+    ) -> bool:
+        if await self.get_keyboard_message(chat_id) != expected:
+            return False
+        self._keyboards.put(chat_id, message_id)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._keyboards),
+            "evictions": self._keyboards.evictions,
+        }
+
+
+class SqlChatStateStore:
+    """Store backed by the ``chat_state`` table, shared by all processes."""
+
+    async def get_keyboard_message(self, chat_id: int) -> Optional[int]:
+        async with get_read_session() as session:
+            state = await session.get(ChatState, chat_id)
+        return state.keyboard_message_id if state else None
+
+    async def set_keyboard_message(
+        self, chat_id: int, message_id: Optional[int]
+    ) -> None:
+        async with get_session() as session:
+            await session.merge(
+                ChatState(chat_id=chat_id, keyboard_message_id=message_id)
+            )
+            await session.commit()
+
+    async def compare_and_set_keyboard_message(
+        self,
+        chat_id: int,
+        expected: Optional[int],
+        message_id: Optional[int],
+    ) -> bool:
+        # A single conditional UPDATE, so concurrent writers in other
+        # processes cannot interleave between the compare and the set.
+        if expected is None:
+            current = ChatState.keyboard_message_id.is_(None)
+        else:
+            current = ChatState.keyboard_message_id == expected
+        async with get_session() as session:
+            result = await session.execute(
+                update(ChatState)
+                .where(ChatState.chat_id == chat_id, current)
+                .values(keyboard_message_id=message_id)
+            )
+            if result.rowcount == 1:
+                await session.commit()
+                return True
+            if expected is not None:
+                return False
+            # No row yet counts as "None"; the primary key makes a racing
+            # insert from another process fail instead of overwriting.
+            session.add(ChatState(chat_id=chat_id, keyboard_message_id=message_id))
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return False
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class TieredChatStateStore:
+    """Bounded LRU in front of ``SqlChatStateStore``.
+
+    Reads are served from memory once a chat has been seen; misses load the
+    row (or its absence) from SQL. Writes go to SQL first, then to memory.
+    Compare-and-set always checks SQL and drops the cached value when it
+    loses, so the next read picks up what the other writer stored. Memory
+    stays at ``max_entries`` chats however long the bot runs.
+    """
+
+    def __init__(self, backend: SqlChatStateStore, max_entries: int = 10_000) -> None:
+        self._backend = backend
+        self._memory = _LruMap(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_keyboard_message(self, chat_id: int) -> Optional[int]:
+        value = self._memory.get(chat_id)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await self._backend.get_keyboard_message(chat_id)
+        self._memory.put(chat_id, value)
+        return value
+
+    async def set_keyboard_message(
+        self, chat_id: int, message_id: Optional[int]
+    ) -> None:
+        await self._backend.set_keyboard_message(chat_id, message_id)
+        self._memory.put(chat_id, message_id)
+
+    async def compare_and_set_keyboard_message(
+        self,
+        chat_id: int,
+        expected: Optional[int],
+        message_id: Optional[int],
+    ) -> bool:
+        swapped = await self._backend.compare_and_set_keyboard_message(
+            chat_id, expected, message_id
+        )
+        if swapped:
+            self._memory.put(chat_id, message_id)
+        else:
+            self._memory.discard(chat_id)
+        return swapped
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+            "evictions": self._memory.evictions,
+        }
+
+
+def create_chat_state_store(backend: Optional[str] = None) -> ChatStateStore:
+    backend = backend or os.getenv("CHAT_STATE_BACKEND", "tiered")
+    max_entries = int(os.getenv("CHAT_STATE_CACHE_SIZE", "10000"))
+    if backend == "memory":
+        return MemoryChatStateStore(max_entries)
+    if backend == "sql":
+        return SqlChatStateStore()
+    if backend == "tiered":
+        return TieredChatStateStore(SqlChatStateStore(), max_entries)
+    raise RuntimeError(f"Unknown CHAT_STATE_BACKEND: {backend}")
@@ -1,9 +1,10 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Select, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Ticket, TicketMessage
+from app.db.cache import ticket_cache
+from app.db.models import Ticket, TicketMessage, TicketSummary
 
 
 async def create_ticket(
@@ -15,20 +16,66 @@ async def create_ticket(
     session.add(ticket)
     await session.commit()
     await session.refresh(ticket)
+    ticket_cache.on_ticket_created(ticket)
     return ticket
 
 
+def select_open_ticket(user_id: int, *columns) -> Select:
+    return (
+        select(*(columns or (Ticket,)))
+        .where(Ticket.user_id == user_id, Ticket.status == "open")
+        .order_by(Ticket.id.desc())
+        .limit(1)
+    )
+
+
+def select_ticket_messages(
+    ticket_id: int,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> Select:
+    query = select(TicketMessage).where(TicketMessage.ticket_id == ticket_id)
+    if after_id is not None:
+        query = query.where(TicketMessage.id > after_id)
+    if limit is not None:
+        return query.order_by(TicketMessage.id.desc()).limit(limit)
+    return query.order_by(TicketMessage.id.asc())
+
+
 async def get_open_ticket(
     session: AsyncSession,
     user_id: int,
 ) -> Optional[Ticket]:
+    result = await session.execute(select_open_ticket(user_id))
+    return result.scalar_one_or_none()
+
+
+async def get_open_ticket_id(
+    session: AsyncSession,
+    user_id: int,
+) -> Optional[int]:
+    """Like ``get_open_ticket`` but answered from the index alone."""
+    result = await session.execute(select_open_ticket(user_id, Ticket.id))
+    return result.scalar_one_or_none()
+
+
+async def get_ticket_state(
+    session: AsyncSession,
+    ticket_id: int,
+) -> Optional[Tuple[str, Optional[int]]]:
+    """Return the ticket status and its latest message id in one query."""
+    last_message_id = (
+        select(func.max(TicketMessage.id))
+        .where(TicketMessage.ticket_id == ticket_id)
+        .scalar_subquery()
+    )
     result = await session.execute(
-        select(Ticket)
-        .where(Ticket.user_id == user_id, Ticket.status == "open")
-        .order_by(Ticket.id.desc())
-        .limit(1)
+        select(Ticket.status, last_message_id).where(Ticket.id == ticket_id)
     )
-    return result.scalar_one_or_none()
+    row = result.first()
+    if row is None:
+        return None
+    return row[0], row[1]
 
 
 async def get_ticket(
@@ -65,6 +112,7 @@ async def update_ticket_status(
     ticket.status = status
     await session.commit()
     await session.refresh(ticket)
+    ticket_cache.on_status_changed(ticket_id, status)
     return ticket
 
 
@@ -82,6 +130,7 @@ async def add_ticket_message(
     session.add(message)
     await session.commit()
     await session.refresh(message)
+    ticket_cache.on_messages_added([message])
     return message
 
 
@@ -89,14 +138,97 @@ async def get_ticket_messages(
     session: AsyncSession,
     ticket_id: int,
     limit: Optional[int] = None,
+    after_id: Optional[int] = None,
 ) -> List[TicketMessage]:
-    query = select(TicketMessage).where(TicketMessage.ticket_id == ticket_id)
+    result = await session.execute(
+        select_ticket_messages(ticket_id, limit, after_id)
+    )
+    rows = list(result.scalars().all())
     if limit is not None:
-        query = query.order_by(TicketMessage.id.desc()).limit(limit)
-        result = await session.execute(query)
-        rows = list(result.scalars().all())
         rows.reverse()
-        return rows
-    query = query.order_by(TicketMessage.id.asc())
-    result = await session.execute(query)
-    return list(result.scalars().all())
+    return rows
+
+
+async def get_ticket_summary(
+    session: AsyncSession,
+    ticket_id: int,
+) -> Optional[TicketSummary]:
+    return await session.get(TicketSummary, ticket_id)
+
+
+async def save_ticket_summary(
+    session: AsyncSession,
+    ticket_id: int,
+    content: str,
+    last_message_id: int,
+) -> TicketSummary:
+    summary = await session.merge(
+        TicketSummary(
+            ticket_id=ticket_id,
+            content=content,
+            last_message_id=last_message_id,
+        )
+    )
+    await session.commit()
+    ticket_cache.on_summary_updated(summary)
+    return summary
+
+
+async def add_ticket_messages(
+    session: AsyncSession,
+    messages: Sequence[Tuple[int, str, str]],
+    commit: bool = True,
+) -> List[TicketMessage]:
+    """Insert ``(ticket_id, role, content)`` rows with one executemany.
+
+    With ``commit=False`` the caller commits and is responsible for
+    notifying the ticket cache.
+    """
+    if not messages:
+        return []
+    result = await session.scalars(
+        insert(TicketMessage).returning(TicketMessage),
+        [
+            {"ticket_id": ticket_id, "role": role, "content": content}
+            for ticket_id, role, content in messages
+        ],
+    )
+    rows = list(result.all())
+    if commit:
+        await session.commit()
+        ticket_cache.on_messages_added(rows)
+    return rows
+
+
+class TicketUnitOfWork:
+    """Stage ticket status changes and messages, then write them at once.
+
+    ``commit`` issues the status updates and a single bulk message insert in
+    one transaction, without refreshing any rows.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+        self._statuses: Dict[int, str] = {}
+        self._messages: List[Tuple[int, str, str]] = []
+
+    def set_status(self, ticket_id: int, status: str) -> None:
+        self._statuses[ticket_id] = status
+
+    def add_message(self, ticket_id: int, role: str, content: str) -> None:
+        self._messages.append((ticket_id, role, content))
+
+    async def commit(self) -> None:
+        if not self._statuses and not self._messages:
+            return
+        for ticket_id, status in self._statuses.items():
+            await self._session.execute(
+                update(Ticket).where(Ticket.id == ticket_id).values(status=status)
+            )
+        rows = await add_ticket_messages(self._session, self._messages, commit=False)
+        await self._session.commit()
+        for ticket_id, status in self._statuses.items():
+            ticket_cache.on_status_changed(ticket_id, status)
+        ticket_cache.on_messages_added(rows)
+        self._statuses.clear()
+        self._messages.clear()
@@ -1,29 +1,115 @@
 import os
 from contextlib import asynccontextmanager
+from typing import List, Optional
 
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
+from app.db.migrations import apply_migrations
 from app.db.models import Base
 
 
+PRODUCTION_PROFILE = "production"
+
+
 def get_database_url() -> str:
     return os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./app.db")
 
 
-def create_engine() -> AsyncEngine:
-    return create_async_engine(get_database_url(), future=True)
+def get_db_profile() -> str:
+    return os.getenv("DB_PROFILE", "default")
+
+
+def is_production_sqlite(url: str, profile: str) -> bool:
+    return url.startswith("sqlite") and profile == PRODUCTION_PROFILE
+
+
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', '268435456'))}",
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def create_engine(
+    url: Optional[str] = None,
+    profile: Optional[str] = None,
+    read_only: bool = False,
+) -> AsyncEngine:
+    """Build an engine for the configured database.
+
+    With ``DB_PROFILE=production`` on SQLite, the writer engine holds a
+    single pooled connection so writes are serialized, and read-only
+    engines get a small pool of ``query_only`` connections. Both use WAL
+    so readers are never blocked by the writer.
+    """
+    url = url or get_database_url()
+    profile = profile or get_db_profile()
+    if not is_production_sqlite(url, profile):
+        return create_async_engine(url, future=True)
+
+    if read_only:
+        pool_size = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    else:
+        pool_size = 1
+    engine = create_async_engine(
+        url,
+        future=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+    )
+    pragmas = sqlite_pragmas(read_only=read_only)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
 
 
 engine = create_engine()
+if is_production_sqlite(get_database_url(), get_db_profile()):
+    read_engine = create_engine(read_only=True)
+else:
+    read_engine = engine
 SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine, autoflush=False, expire_on_commit=False
+)
 
 
 async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(apply_migrations)
+
+
+async def close_db() -> None:
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
 
 
 @asynccontextmanager
 async def get_session():
     async with SessionLocal() as session:
         yield session
+
+
+@asynccontextmanager
+async def get_read_session():
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,95 @@
+import logging
+import os
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.db.crud import select_open_ticket, select_ticket_messages
+from app.db.models import Base, Ticket
+
+
+logger = logging.getLogger(__name__)
+
+# Single-column indexes superseded by the composite ones in the models.
+LEGACY_INDEXES = ["ix_tickets_user_id", "ix_ticket_messages_ticket_id"]
+
+# Hot-path queries and the index SQLite must use for each of them.
+QUERY_PLAN_CHECKS = [
+    (
+        "open ticket id",
+        select_open_ticket(1, Ticket.id),
+        "USING COVERING INDEX ix_tickets_user_id_status_id",
+    ),
+    (
+        "open ticket",
+        select_open_ticket(1),
+        "USING INDEX ix_tickets_user_id_status_id",
+    ),
+    (
+        "recent messages",
+        select_ticket_messages(1, limit=20),
+        "USING INDEX ix_ticket_messages_ticket_id_id",
+    ),
+    (
+        "all messages",
+        select_ticket_messages(1),
+        "USING INDEX ix_ticket_messages_ticket_id_id",
+    ),
+]
+
+
+def apply_migrations(conn: Connection) -> None:
+    """Bring indexes of an existing database in line with the models.
+
+    ``create_all`` only creates missing tables, so indexes added to tables
+    that already exist are created here. Safe to run on every start.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    for name in LEGACY_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("PRAGMA optimize"))
+        verify_query_plans(conn)
+    logger.info("Database migrations applied")
+
+
+def explain_query_plan(conn: Connection, statement) -> str:
+    sql = str(
+        statement.compile(
+            dialect=conn.dialect,
+            compile_kwargs={"literal_binds": True},
+        )
+    )
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def check_query_plans(conn: Connection) -> List[str]:
+    """Return ``name: plan`` for each hot query that misses its index."""
+    failures = []
+    for name, statement, expected in QUERY_PLAN_CHECKS:
+        plan = explain_query_plan(conn, statement)
+        if expected not in plan or "TEMP B-TREE" in plan:
+            failures.append(f"{name}: {plan}")
+    return failures
+
+
+def verify_query_plans(conn: Connection) -> None:
+    """Fail startup if a hot query would scan or sort instead of using its index.
+
+    ``DB_QUERY_PLAN_CHECK=warn`` only logs the regression, ``off`` skips it.
+    """
+    mode = os.getenv("DB_QUERY_PLAN_CHECK", "strict")
+    if mode == "off":
+        return
+    failures = check_query_plans(conn)
+    if not failures:
+        logger.info("Query plans verified: queries=%s", len(QUERY_PLAN_CHECKS))
+        return
+    if mode == "warn":
+        logger.error("Query plan regression: %s", "; ".join(failures))
+        return
+    raise RuntimeError(f"Query plan regression: {'; '.join(failures)}")
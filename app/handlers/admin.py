@@ -0,0 +1,40 @@
+import logging
+import os
+from typing import Optional, Set
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+from app.services.container import ServiceContainer
+
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+def get_admin_ids() -> Set[int]:
+    raw = os.getenv("ADMIN_USER_IDS", "")
+    return {int(part) for part in raw.split(",") if part.strip()}
+
+
+@router.message(Command("reload_profile"))
+async def reload_profile_handler(
+    message: Message,
+    services: ServiceContainer,
+) -> Optional[SendMessage]:
+    user_id = message.from_user.id if message.from_user else None
+    if user_id not in get_admin_ids():
+        # Ignored for everyone else, without revealing the command exists.
+        return None
+    changed = await services.profile.areload(force=True)
+    version = services.profile.current.version
+    logger.info(
+        "Assistant profile reload by admin: user_id=%s changed=%s version=%s",
+        user_id,
+        changed,
+        version,
+    )
+    status = "reloaded" if changed else "unchanged"
+    return message.answer(f"Profile {status} (version {version}).")
@@ -1,9 +1,12 @@
 import logging
+from typing import Optional
 
 from aiogram import F, Router
+from aiogram.methods import AnswerCallbackQuery
 from aiogram.types import CallbackQuery
 
-from app.db import add_ticket_message, get_session, get_ticket, update_ticket_status
+from app.db import TicketUnitOfWork, get_session, get_ticket
+from app.services.container import ServiceContainer
 
 
 router = Router()
@@ -11,7 +14,10 @@ logger = logging.getLogger(__name__)
 
 
 @router.callback_query(F.data.startswith("ticket:"))
-async def ticket_status_handler(callback: CallbackQuery) -> None:
+async def ticket_status_handler(
+    callback: CallbackQuery,
+    services: ServiceContainer,
+) -> Optional[AnswerCallbackQuery]:
     if not callback.data or not callback.message:
         await callback.answer()
         return
@@ -66,8 +72,10 @@ async def ticket_status_handler(callback: CallbackQuery) -> None:
             if ticket.status != "open":
                 await callback.answer("Ticket already closed.")
                 return
-            await update_ticket_status(session, ticket_id, new_status)
-            await add_ticket_message(session, ticket_id, "system", status_text)
+            work = TicketUnitOfWork(session)
+            work.set_status(ticket_id, new_status)
+            work.add_message(ticket_id, "system", status_text)
+            await work.commit()
     except Exception:
         logger.exception(
             "Failed to update ticket status: user_id=%s message_id=%s",
@@ -78,4 +86,9 @@ async def ticket_status_handler(callback: CallbackQuery) -> None:
         return
 
     await callback.message.edit_text(status_text)
-    await callback.answer("Updated.")
+    # The edit removed the keyboard; forget it unless a newer reply already
+    # replaced it.
+    await services.chat_state.compare_and_set_keyboard_message(
+        callback.message.chat.id, message_id, None
+    )
+    return callback.answer("Updated.")
@@ -1,30 +1,88 @@
+import asyncio
 import logging
+import os
 import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from aiogram import F, Router
-from aiogram.types import Message
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardMarkup, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.db import (
-    add_ticket_message,
+    TicketUnitOfWork,
+    add_ticket_messages,
     create_ticket,
-    get_open_ticket,
+    get_open_ticket_id,
+    get_read_session,
     get_session,
     get_ticket_messages,
-    update_ticket_status,
+    get_ticket_state,
+    get_ticket_summary,
 )
-from app.services.faq_prompt import build_system_prompt
-from app.services.chroma_store import ChromaStore
+from app.db.cache import MODE_VALIDATE, CachedTicket, ticket_cache
+from app.db.models import TicketMessage, TicketSummary
+from app.services.container import ServiceContainer
 from app.services.embedding_client import EmbeddingClient
-from app.services.gpt_client import GPTClient
-from app.services.triage import needs_agent, strip_agent_marker
+from app.services.gpt_client import GPTMeta
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.scheduler import ChatQueueFull
+from app.services.summarizer import unsummarized
+from app.services.timing import StageTimings
+from app.services.triage import MarkerFilter, needs_agent, strip_agent_marker
+from app.services.vector_store import VectorStore
 
 
 router = Router()
 logger = logging.getLogger(__name__)
-last_ticket_message_id = {}
 CONTEXT_MESSAGE_LIMIT = 20
-RAG_RESULT_LIMIT = 5
+RAG_RESULT_LIMIT = int(os.getenv("RAG_RESULT_LIMIT", "5"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+STREAM_REPLIES = os.getenv("GPT_STREAMING", "1") == "1"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+STREAM_PLACEHOLDER = "…"
+TELEGRAM_TEXT_LIMIT = 4096
+
+
+def split_message(text: str, limit: int = TELEGRAM_TEXT_LIMIT) -> List[str]:
+    """Split ``text`` into parts Telegram accepts, preferring paragraph breaks."""
+    parts: List[str] = []
+    text = text.strip()
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, limit // 2, limit)
+            if cut != -1:
+                break
+        if cut == -1:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+async def send_reply(
+    message: Message,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+) -> Message:
+    """Answer with one message per part; the keyboard goes on the last one."""
+    return await _send_parts(message, split_message(text), reply_markup)
+
+
+async def _send_parts(
+    message: Message,
+    parts: List[str],
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+) -> Message:
+    for part in parts[:-1]:
+        await message.answer(part)
+    return await message.answer(parts[-1], reply_markup=reply_markup)
 
 
 def build_ticket_keyboard(ticket_id: int):
@@ -36,21 +94,31 @@ def build_ticket_keyboard(ticket_id: int):
     builder.adjust(2)
     return builder.as_markup()
 
-def build_context_text(messages) -> str:
-    if not messages:
-        return ""
-    lines = []
-    for item in messages:
-        if item.role == "user":
-            role = "User"
-        elif item.role == "assistant":
-            role = "Assistant"
-        else:
-            role = "System"
-        lines.append(f"{role}: {item.content}")
-    return "\n".join(lines)
 
-def build_rag_query(user_text: str, history) -> str:
+async def clear_ticket_keyboard(message: Message, message_id: Optional[int]) -> None:
+    if not message_id:
+        return
+    try:
+        await message.bot.edit_message_reply_markup(
+            chat_id=message.chat.id,
+            message_id=message_id,
+            reply_markup=None,
+        )
+    except Exception:
+        logger.info(
+            "Failed to clear previous ticket keyboard: chat_id=%s message_id=%s",
+            message.chat.id,
+            message_id,
+        )
+
+
+def build_rag_query(
+    user_text: str,
+    history,
+    summary: Optional[TicketSummary] = None,
+) -> str:
+    if summary is not None:
+        return "\n".join([part for part in (summary.content, user_text) if part])
     parts = []
     for item in history:
         if item.role == "user":
@@ -59,108 +127,359 @@ def build_rag_query(user_text: str, history) -> str:
     return "\n".join([part for part in parts if part])
 
 
-async def build_rag_context(rag_query: str) -> str:
-    embedder = EmbeddingClient()
-    store = ChromaStore()
+@dataclass
+class RagContext:
+    hits: List[Dict[str, object]]
+    embedding: List[float]
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+async def build_rag_context(
+    rag_query: str,
+    embedder: EmbeddingClient,
+    store: VectorStore,
+    lexical: Optional[LexicalIndex] = None,
+) -> RagContext:
     embedding = (await embedder.embed([rag_query]))[0]
-    hits = await store.search(embedding, top_k=RAG_RESULT_LIMIT)
+    if lexical is None:
+        hits = await store.search(embedding, top_k=RAG_RESULT_LIMIT)
+        keyword_hits = []
+    else:
+        # Keyword hits come from the BM25 file of the version being served.
+        version = store.live_version()
+        vector_hits, keyword_hits = await asyncio.gather(
+            store.search(embedding, top_k=HYBRID_CANDIDATES),
+            lexical.search(rag_query, version, top_k=HYBRID_CANDIDATES),
+        )
+        hits = reciprocal_rank_fusion(
+            [vector_hits, keyword_hits], limit=RAG_RESULT_LIMIT, k=RRF_K
+        )
     logger.info(
-        "RAG retrieval completed: hits=%s query_len=%s",
+        "RAG retrieval completed: hits=%s keyword_hits=%s query_len=%s",
         len(hits),
+        len(keyword_hits),
         len(rag_query),
     )
-    if not hits:
-        return ""
-    lines = []
-    for hit in hits:
-        text = hit.get("text") or ""
-        source = hit.get("source") or "unknown"
-        if not text:
-            continue
-        lines.append(f"Source: {source}\n{text}")
-    return "\n\n".join(lines)
+    hits = [hit for hit in hits if hit.get("text")]
+    return RagContext(
+        hits=hits,
+        embedding=embedding,
+        chunk_ids=[str(hit.get("id")) for hit in hits],
+    )
+
+class StreamingReply:
+    """Placeholder message that is progressively edited with streamed text.
+
+    Edits are throttled to ``interval`` seconds to stay under Telegram edit
+    rate limits, and the escalation marker is filtered out before display.
+    """
+
+    def __init__(self, message: Message, interval: float = STREAM_EDIT_INTERVAL):
+        self._message = message
+        self._interval = interval
+        self._sent: Optional[Message] = None
+        self._shown = ""
+        self._next_edit_at = 0.0
+
+    async def start(self) -> None:
+        self._sent = await self._message.answer(STREAM_PLACEHOLDER)
+
+    async def consume(self, deltas: AsyncIterator[str]) -> str:
+        marker_filter = MarkerFilter()
+        raw_parts: List[str] = []
+        visible = ""
+        async for delta in deltas:
+            raw_parts.append(delta)
+            visible += marker_filter.feed(delta)
+            if time.monotonic() >= self._next_edit_at:
+                await self._edit(visible)
+        return "".join(raw_parts)
+
+    async def finish(
+        self,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> Message:
+        """Show the final text; return the message that carries the keyboard.
+
+        Text over ``TELEGRAM_TEXT_LIMIT`` is split: the placeholder shows the
+        first part and the rest follow as new messages.
+        """
+        if self._sent is None:
+            return await send_reply(self._message, text, reply_markup)
+        first, *rest = split_message(text)
+        markup = None if rest else reply_markup
+        if first != self._shown or markup is not None:
+            await self._wait_for_slot()
+            try:
+                await self._sent.edit_text(first, reply_markup=markup)
+            except TelegramRetryAfter as exc:
+                await asyncio.sleep(exc.retry_after)
+                await self._sent.edit_text(first, reply_markup=markup)
+            except TelegramBadRequest:
+                if first != self._shown or markup is not None:
+                    raise
+        if rest:
+            return await _send_parts(self._message, rest, reply_markup)
+        return self._sent
+
+    async def fail(self, text: str) -> None:
+        if self._sent is None:
+            await self._message.answer(text)
+            return
+        try:
+            await self._sent.edit_text(text)
+        except Exception:
+            await self._message.answer(text)
+
+    async def _edit(self, visible: str) -> None:
+        text = visible.strip()[:TELEGRAM_TEXT_LIMIT]
+        if self._sent is None or not text or text == self._shown:
+            return
+        try:
+            await self._sent.edit_text(text)
+            self._shown = text
+            self._next_edit_at = time.monotonic() + self._interval
+        except TelegramRetryAfter as exc:
+            self._next_edit_at = time.monotonic() + exc.retry_after
+        except TelegramBadRequest:
+            self._next_edit_at = time.monotonic() + self._interval
+
+    async def _wait_for_slot(self) -> None:
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def load_ticket_context(
+    user_id: int,
+) -> Tuple[int, List[TicketMessage], Optional[TicketSummary]]:
+    entry = ticket_cache.get(user_id, CONTEXT_MESSAGE_LIMIT)
+    if entry is not None:
+        if ticket_cache.mode != MODE_VALIDATE or await _is_cache_current(entry):
+            return (
+                entry.ticket_id,
+                ticket_cache.recent(entry, CONTEXT_MESSAGE_LIMIT),
+                entry.summary,
+            )
+        ticket_cache.discard_user(user_id)
+
+    async with get_read_session() as session:
+        ticket_id = await get_open_ticket_id(session, user_id)
+        if ticket_id is not None:
+            history = await get_ticket_messages(
+                session,
+                ticket_id,
+                limit=CONTEXT_MESSAGE_LIMIT,
+            )
+            summary = await get_ticket_summary(session, ticket_id)
+            ticket_cache.put(user_id, ticket_id, history, summary)
+            return ticket_id, history, summary
+    async with get_session() as session:
+        ticket = await create_ticket(session, user_id)
+    return ticket.id, [], None
+
+
+async def _is_cache_current(entry: CachedTicket) -> bool:
+    async with get_read_session() as session:
+        state = await get_ticket_state(session, entry.ticket_id)
+    return state == ("open", entry.last_message_id)
+
+
+async def store_user_messages(ticket_id: int, user_texts: List[str]) -> None:
+    async with get_session() as session:
+        await add_ticket_messages(
+            session, [(ticket_id, "user", text) for text in user_texts]
+        )
+
+
+async def _cancel_pipeline(
+    retrieval_task: Optional[asyncio.Task],
+    finishing: List[Optional[asyncio.Task]],
+) -> None:
+    # Retrieval is useless once the turn has failed, but the user message
+    # write and the placeholder are left to finish so the ticket history
+    # stays complete and the error can replace the placeholder.
+    if retrieval_task is not None and not retrieval_task.done():
+        retrieval_task.cancel()
+    pending = [
+        task for task in (retrieval_task, *finishing) if task is not None
+    ]
+    results = await asyncio.gather(*pending, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Pipeline stage failed during cleanup: %r", result)
+
 
 @router.message(F.text)
-async def gpt_reply_handler(message: Message) -> None:
-    user_text = message.text
-    if not user_text:
-        await message.answer("Please send a text message.")
-        return
+async def gpt_reply_handler(
+    message: Message,
+    services: ServiceContainer,
+) -> Optional[SendMessage]:
+    if not message.text or message.from_user is None:
+        return message.answer("Please send a text message.")
 
-    user_id = message.from_user.id if message.from_user else None
-    if user_id is None:
-        await message.answer("Please send a text message.")
-        return
+    if services.scheduler is None:
+        await answer_turn([message], services)
+        return None
+    # The turn runs on the chat's worker, so the update is acknowledged at
+    # once and a webhook response is not held open for the LLM call.
+    try:
+        services.scheduler.enqueue(
+            message.chat.id,
+            message,
+            lambda batch: answer_turn(batch, services),
+        )
+    except ChatQueueFull:
+        logger.warning(
+            "Chat queue full: chat_id=%s message_id=%s",
+            message.chat.id,
+            message.message_id,
+        )
+        return message.answer(
+            "Please wait, I am still answering your previous messages."
+        )
+    return None
+
+
+async def answer_turn(messages: List[Message], services: ServiceContainer) -> None:
+    """Answer one turn; several quick messages from a chat may be merged."""
+    message = messages[-1]
+    user_texts = [item.text for item in messages if item.text]
+    user_text = "\n\n".join(user_texts)
+    user_id = message.from_user.id
 
     message_id = message.message_id
     text_len = len(user_text)
+    # Read once so the whole turn uses one profile version even if it reloads.
+    profile = services.profile.current
     logger.info(
-        "GPT request started: user_id=%s message_id=%s text_len=%s",
+        "GPT request started: user_id=%s message_id=%s text_len=%s messages=%s",
         user_id,
         message_id,
         text_len,
+        len(messages),
     )
+    timings = StageTimings()
+    streaming: Optional[StreamingReply] = None
+    placeholder_task: Optional[asyncio.Task] = None
+    retrieval_task: Optional[asyncio.Task] = None
+    store_task: Optional[asyncio.Task] = None
+    start_time = time.monotonic()
     try:
-        async with get_session() as session:
-            ticket = await get_open_ticket(session, user_id)
-            if not ticket:
-                ticket = await create_ticket(session, user_id)
-            ticket_id = ticket.id
-
-            history = await get_ticket_messages(
-                session,
-                ticket_id,
-                limit=CONTEXT_MESSAGE_LIMIT,
+        if STREAM_REPLIES:
+            streaming = StreamingReply(message)
+            placeholder_task = asyncio.create_task(
+                timings.track("placeholder", streaming.start())
             )
-            context_text = build_context_text(history)
-            await add_ticket_message(session, ticket_id, "user", user_text)
-
-        start_time = time.monotonic()
-        client = GPTClient()
-        rag_query = build_rag_query(user_text, history)
-        rag_context = await build_rag_context(rag_query)
-        prompt_blocks = [build_system_prompt()]
-        if context_text:
-            prompt_blocks.append(
-                f"Conversation history:\n{context_text}"
-            )
-        if rag_context:
-            prompt_blocks.append(
-                f"Relevant context:\n{rag_context}"
+
+        ticket_id, history, summary = await timings.track(
+            "ticket", load_ticket_context(user_id)
+        )
+        recent = unsummarized(history, summary)
+        store_task = asyncio.create_task(
+            timings.track("store_user", store_user_messages(ticket_id, user_texts))
+        )
+        rag_query = build_rag_query(user_text, recent, summary)
+        retrieval_task = asyncio.create_task(
+            timings.track(
+                "retrieve",
+                build_rag_context(
+                    rag_query,
+                    services.embedder,
+                    services.store,
+                    services.lexical,
+                ),
             )
-        system_prompt = "\n\n".join(prompt_blocks)
-        reply_text, meta = await client.chat(
-            user_text=user_text,
-            system_prompt=system_prompt,
         )
+        rag = await retrieval_task
+        if placeholder_task is not None:
+            await placeholder_task
+
+        answer_cache = services.answer_cache
+        use_cache = answer_cache is not None and answer_cache.is_eligible(
+            bool(history)
+        )
+        cached = None
+        if use_cache:
+            cached = answer_cache.lookup(rag.embedding, rag.chunk_ids)
+
+        if cached:
+            reply_text = cached.reply_text
+            needs_specialist = cached.needs_agent
+            meta: GPTMeta = {}
+        else:
+            system_prompt = services.prompt_builder.build(
+                profile.system_prompt,
+                recent,
+                rag.hits,
+                user_text,
+                summary=summary.content if summary else None,
+            ).system_prompt
+            async with timings.measure("chat"):
+                if streaming is not None:
+                    meta = {}
+                    reply_text = await streaming.consume(
+                        services.gpt.stream_chat(
+                            user_text=user_text,
+                            system_prompt=system_prompt,
+                            meta=meta,
+                        )
+                    )
+                else:
+                    reply_text, meta = await services.gpt.chat(
+                        user_text=user_text,
+                        system_prompt=system_prompt,
+                    )
+            needs_specialist = needs_agent(reply_text)
+            reply_text = strip_agent_marker(reply_text)
+            if use_cache:
+                answer_cache.store(
+                    rag.embedding,
+                    rag.chunk_ids,
+                    reply_text,
+                    needs_specialist,
+                )
+        await store_task
+    except asyncio.CancelledError:
+        await _cancel_pipeline(retrieval_task, [placeholder_task, store_task])
+        raise
     except Exception:
         logger.exception(
-            "GPT request failed: user_id=%s message_id=%s",
+            "GPT request failed: user_id=%s message_id=%s timings=%s",
             user_id,
             message_id,
+            timings.format(),
         )
-        await message.answer(
-            "Sorry, something went wrong while generating a reply."
-        )
+        await _cancel_pipeline(retrieval_task, [placeholder_task, store_task])
+        error_text = "Sorry, something went wrong while generating a reply."
+        if streaming is not None:
+            await streaming.fail(error_text)
+        else:
+            await message.answer(error_text)
         return
 
     duration_ms = int((time.monotonic() - start_time) * 1000)
     logger.info(
-        "GPT request completed: status=%s duration_ms=%s model=%s request_id=%s "
-        "prompt_tokens=%s completion_tokens=%s total_tokens=%s user_id=%s message_id=%s",
+        "GPT request completed: status=%s cached=%s duration_ms=%s timings=%s "
+        "model=%s request_id=%s prompt_version=%s prompt_tokens=%s "
+        "cached_prompt_tokens=%s completion_tokens=%s total_tokens=%s "
+        "user_id=%s message_id=%s",
         meta.get("status_code"),
+        cached is not None,
         duration_ms,
+        timings.format(),
         meta.get("model"),
         meta.get("request_id"),
+        profile.version,
         meta.get("prompt_tokens"),
+        meta.get("cached_tokens"),
         meta.get("completion_tokens"),
         meta.get("total_tokens"),
         user_id,
         message_id,
     )
 
-    needs_specialist = needs_agent(reply_text)
-    reply_text = strip_agent_marker(reply_text)
     if needs_specialist:
         logger.warning(
             "Triage: needs specialist: user_id=%s message_id=%s",
@@ -168,56 +487,64 @@ async def gpt_reply_handler(message: Message) -> None:
             message_id,
         )
         reply_text = f"{reply_text}\n\nStatus: needs a specialist."
-        try:
-            async with get_session() as session:
-                await update_ticket_status(session, ticket_id, "needs_agent")
-                await add_ticket_message(
-                    session,
+
+    try:
+        async with get_session() as session:
+            work = TicketUnitOfWork(session)
+            if needs_specialist:
+                work.set_status(ticket_id, "needs_agent")
+                work.add_message(
                     ticket_id,
                     "system",
                     "Status updated: needs a specialist.",
                 )
-        except Exception:
-            logger.exception(
-                "Failed to auto-update ticket status: user_id=%s message_id=%s",
-                user_id,
-                message_id,
+            work.add_message(ticket_id, "assistant", reply_text)
+            await work.commit()
+        if services.summarizer is not None:
+            # The next turn's history: everything the prompt builder would
+            # budget, counted with the system prompt it sits next to.
+            pending = [
+                *recent,
+                *(TicketMessage(role="user", content=text) for text in user_texts),
+                TicketMessage(role="assistant", content=reply_text),
+            ]
+            services.summarizer.maybe_refresh(
+                ticket_id,
+                len(pending),
+                prompt_tokens=services.prompt_builder.count(
+                    profile.system_prompt,
+                    pending,
+                    summary=summary.content if summary else None,
+                ),
             )
-
-    try:
-        async with get_session() as session:
-            await add_ticket_message(session, ticket_id, "assistant", reply_text)
     except Exception:
         logger.exception(
-            "Failed to store assistant message: user_id=%s message_id=%s",
+            "Failed to store reply and ticket status: user_id=%s message_id=%s",
             user_id,
             message_id,
         )
 
     chat_id = message.chat.id
-    previous_message_id = last_ticket_message_id.get(chat_id)
-    if previous_message_id:
-        try:
-            await message.bot.edit_message_reply_markup(
-                chat_id=chat_id,
-                message_id=previous_message_id,
-                reply_markup=None,
-            )
-        except Exception:
-            logger.info(
-                "Failed to clear previous ticket keyboard: chat_id=%s message_id=%s",
-                chat_id,
-                previous_message_id,
-            )
+    previous_message_id = await services.chat_state.get_keyboard_message(chat_id)
+    await clear_ticket_keyboard(message, previous_message_id)
 
     reply_markup = None
     if not needs_specialist:
         reply_markup = build_ticket_keyboard(ticket_id)
-    sent = await message.answer(reply_text, reply_markup=reply_markup)
+    if streaming is not None:
+        sent = await streaming.finish(reply_text, reply_markup=reply_markup)
+    else:
+        sent = await send_reply(message, reply_text, reply_markup)
     logger.info(
         "Reply sent: chat_id=%s message_id=%s needs_specialist=%s",
         chat_id,
         sent.message_id,
         needs_specialist,
     )
-    last_ticket_message_id[chat_id] = sent.message_id
+    # Another process may have replied in this chat meanwhile; clear the
+    # keyboard it recorded too, so only the newest one stays clickable.
+    while not await services.chat_state.compare_and_set_keyboard_message(
+        chat_id, previous_message_id, sent.message_id
+    ):
+        previous_message_id = await services.chat_state.get_keyboard_message(chat_id)
+        await clear_ticket_keyboard(message, previous_message_id)
@@ -1,14 +1,14 @@
 from aiogram.filters import CommandStart
 from aiogram import Router
+from aiogram.methods import SendMessage
 from aiogram.types import Message
 
-from app.services.assistant_profile import load_assistant_profile
+from app.services.container import ServiceContainer
 
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def start_handler(message: Message) -> None:
-    profile = load_assistant_profile()
-    await message.answer(profile)
+async def start_handler(message: Message, services: ServiceContainer) -> SendMessage:
+    return message.answer(services.profile.current.profile)
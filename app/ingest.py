@@ -19,12 +19,21 @@ async def run(args: argparse.Namespace) -> None:
     no_flags = not args.parse and not args.index
     do_parse = args.parse or no_flags
     do_index = args.index or no_flags
-    do_reset = args.reset or no_flags
+    do_reset = args.reset or (no_flags and not args.incremental)
 
     if do_parse:
-        await parse_documents(args.docs, args.pairs)
+        await parse_documents(
+            args.docs,
+            args.pairs,
+            incremental=args.incremental,
+            refresh_cache=args.refresh_parse_cache,
+        )
     if do_index:
-        await index_pairs(args.pairs, reset=do_reset)
+        await index_pairs(
+            args.pairs,
+            reset=do_reset,
+            incremental=args.incremental and not do_reset,
+        )
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -32,6 +41,16 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--parse", action="store_true", help="Parse docs to Q/A.")
     parser.add_argument("--index", action="store_true", help="Index Q/A into Chroma.")
     parser.add_argument("--reset", action="store_true", help="Reset Chroma collection.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-parse changed docs and sync changed chunks.",
+    )
+    parser.add_argument(
+        "--refresh-parse-cache",
+        action="store_true",
+        help="Re-extract document text instead of using the parse cache.",
+    )
     parser.add_argument("--docs", default=default_docs_dir(), help="Docs directory.")
     parser.add_argument(
         "--pairs", default=default_pairs_path(), help="Output pairs JSON."
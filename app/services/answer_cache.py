@@ -0,0 +1,178 @@
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    reply_text: str
+    needs_agent: bool
+    embedding: List[float]
+    chunk_ids: FrozenSet[str]
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+    last_hit_at: Optional[float] = None
+
+
+class AnswerCache:
+    """Semantic cache of assistant replies for standalone questions.
+
+    An entry matches when the retrieved chunk ids are identical and the
+    query embedding is within ``threshold`` cosine similarity. Entries are
+    dropped whenever the vector index version reported by
+    ``version_source`` changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        use_with_history: bool = False,
+        version_source: Optional[Callable[[], str]] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.use_with_history = use_with_history
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._version_source = version_source
+        self._version: Optional[str] = None
+        self._buckets: Dict[FrozenSet[str], List[CachedAnswer]] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        version_source: Optional[Callable[[], str]] = None,
+    ) -> Optional["AnswerCache"]:
+        if os.getenv("ANSWER_CACHE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+            use_with_history=os.getenv("ANSWER_CACHE_WITH_HISTORY", "0") == "1",
+            version_source=version_source,
+        )
+
+    def is_eligible(self, has_history: bool) -> bool:
+        return self.use_with_history or not has_history
+
+    def lookup(
+        self,
+        embedding: List[float],
+        chunk_ids: Iterable[str],
+    ) -> Optional[CachedAnswer]:
+        self._check_version()
+        key = frozenset(chunk_ids)
+        bucket = self._buckets.get(key)
+        if not key or not bucket:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        best: Optional[CachedAnswer] = None
+        best_score = self.threshold
+        for entry in list(bucket):
+            if self._ttl and now - entry.created_at > self._ttl:
+                self._remove(key, entry)
+                continue
+            score = _cosine(embedding, entry.embedding)
+            if score >= best_score:
+                best = entry
+                best_score = score
+        if best is None:
+            self.misses += 1
+            return None
+
+        best.hits += 1
+        best.last_hit_at = now
+        self.hits += 1
+        logger.info(
+            "Answer cache hit: similarity=%.4f entry_hits=%s chunks=%s",
+            best_score,
+            best.hits,
+            len(key),
+        )
+        return best
+
+    def store(
+        self,
+        embedding: List[float],
+        chunk_ids: Iterable[str],
+        reply_text: str,
+        needs_agent: bool,
+    ) -> None:
+        self._check_version()
+        key = frozenset(chunk_ids)
+        if not key or self._max_entries <= 0:
+            return
+        entry = CachedAnswer(
+            reply_text=reply_text,
+            needs_agent=needs_agent,
+            embedding=list(embedding),
+            chunk_ids=key,
+        )
+        self._buckets.setdefault(key, []).append(entry)
+        self._size += 1
+        if self._size > self._max_entries:
+            self._evict_oldest()
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._size}
+
+    def _check_version(self) -> None:
+        if self._version_source is None:
+            return
+        version = self._version_source()
+        if version != self._version:
+            if self._size:
+                logger.info(
+                    "Answer cache invalidated: index version %s -> %s",
+                    self._version,
+                    version,
+                )
+            self.clear()
+            self._version = version
+
+    def _evict_oldest(self) -> None:
+        oldest_key = None
+        oldest: Optional[CachedAnswer] = None
+        for key, bucket in self._buckets.items():
+            for entry in bucket:
+                if oldest is None or entry.created_at < oldest.created_at:
+                    oldest_key = key
+                    oldest = entry
+        if oldest is not None and oldest_key is not None:
+            self._remove(oldest_key, oldest)
+
+    def _remove(self, key: FrozenSet[str], entry: CachedAnswer) -> None:
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return
+        bucket.remove(entry)
+        self._size -= 1
+        if not bucket:
+            del self._buckets[key]
+
+
+def _cosine(left: List[float], right: List[float]) -> float:
+    dot = sum(a * b for a, b in zip(left, right))
+    norm = math.sqrt(sum(a * a for a in left)) * math.sqrt(
+        sum(b * b for b in right)
+    )
+    if not norm:
+        return 0.0
+    return dot / norm
@@ -1,5 +1,15 @@
+import asyncio
+import hashlib
+import logging
 import os
+import signal
+from dataclasses import dataclass
+from typing import Optional
 
+from app.services.faq_prompt import build_system_prompt
+
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_PROFILE = (
     "You are a helpful assistant. "
@@ -8,13 +18,128 @@ DEFAULT_PROFILE = (
 )
 
 
-def load_assistant_profile() -> str:
-    path = os.getenv("ASSISTANT_PROFILE_PATH", "./data/assistant_profile.txt")
+def get_profile_path() -> str:
+    return os.getenv("ASSISTANT_PROFILE_PATH", "./data/assistant_profile.txt")
+
+
+def load_assistant_profile(path: Optional[str] = None) -> str:
     try:
-        with open(path, "r", encoding="utf-8") as handle:
+        with open(path or get_profile_path(), "r", encoding="utf-8") as handle:
             content = handle.read().strip()
     except FileNotFoundError:
         return DEFAULT_PROFILE
     if not content:
         return DEFAULT_PROFILE
     return content
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    """One immutable version of the profile and the system prompt built from it.
+
+    The system prompt is always the first block sent to the model and does not
+    change between messages, so the provider can reuse its cached prefix.
+    """
+
+    profile: str
+    system_prompt: str
+    version: str
+
+
+def compile_profile(profile: str) -> CompiledProfile:
+    system_prompt = build_system_prompt(profile)
+    version = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+    return CompiledProfile(profile=profile, system_prompt=system_prompt, version=version)
+
+
+class ProfileStore:
+    """Holds the compiled profile in memory and swaps it when the file changes.
+
+    Handlers read ``current`` once per turn; a reload replaces the whole
+    ``CompiledProfile`` in a single assignment, so a turn never mixes two
+    versions. The file is checked every ``check_seconds`` (0 disables
+    polling), on SIGHUP, and when ``reload`` is called.
+    """
+
+    def __init__(self, path: str, check_seconds: float = 2.0) -> None:
+        self._path = path
+        self._check_seconds = check_seconds
+        self._mtime_ns: Optional[int] = None
+        self._current = compile_profile(DEFAULT_PROFILE)
+        self._watcher: Optional[asyncio.Task] = None
+        self._signal_reload: Optional[asyncio.Task] = None
+        self._signal_installed = False
+        self.reloads = 0
+
+    @classmethod
+    def from_env(cls) -> "ProfileStore":
+        return cls(
+            get_profile_path(),
+            check_seconds=float(os.getenv("PROFILE_RELOAD_SECONDS", "2")),
+        )
+
+    @property
+    def current(self) -> CompiledProfile:
+        return self._current
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the file if its mtime changed; return True if swapped."""
+        mtime_ns = self._stat_mtime()
+        if not force and mtime_ns == self._mtime_ns:
+            return False
+        compiled = compile_profile(load_assistant_profile(self._path))
+        self._mtime_ns = mtime_ns
+        if compiled.version == self._current.version:
+            return False
+        previous = self._current.version
+        self._current = compiled
+        self.reloads += 1
+        logger.info(
+            "Assistant profile loaded: path=%s version=%s previous=%s",
+            self._path,
+            compiled.version,
+            previous,
+        )
+        return True
+
+    async def areload(self, force: bool = False) -> bool:
+        return await asyncio.to_thread(self.reload, force)
+
+    async def start(self) -> None:
+        await self.areload(force=True)
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self._on_signal)
+            self._signal_installed = True
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # No SIGHUP on Windows, and signals only work in the main thread.
+            pass
+        if self._check_seconds > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self) -> None:
+        if self._signal_installed:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            self._signal_installed = False
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def _on_signal(self) -> None:
+        logger.info("Assistant profile reload requested: signal=SIGHUP")
+        self._signal_reload = asyncio.create_task(self.areload(force=True))
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self._check_seconds)
+            try:
+                await self.areload()
+            except Exception:
+                logger.exception("Assistant profile reload failed: path=%s", self._path)
+
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return None
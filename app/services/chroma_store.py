@@ -2,24 +2,19 @@ import asyncio
 import logging
 import os
 import shutil
+import time
 import uuid
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 
 import chromadb
 from chromadb.config import Settings
 from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
 
-
-logger = logging.getLogger(__name__)
+from app.services.vector_store import ChunkRecord, VersionAliases
 
 
-@dataclass(frozen=True)
-class ChunkRecord:
-    embedding: List[float]
-    text: str
-    source: str
-    chunk_id: Optional[str] = None
+logger = logging.getLogger(__name__)
 
 
 class ChromaStore:
@@ -33,6 +28,10 @@ class ChromaStore:
             "CHROMA_COLLECTION", "faq_chunks"
         )
         self._client: Optional[ClientAPI] = None
+        self._collection: Optional[Collection] = None
+        self._staging: Optional[Collection] = None
+        self._aliases = VersionAliases(self._path, self._collection_name)
+        self._aliases_seen: Optional[int] = None
 
     async def ensure_collection(self, drop_existing: bool = False) -> None:
         await asyncio.to_thread(self._ensure_collection_sync, drop_existing)
@@ -40,6 +39,9 @@ class ChromaStore:
     async def insert_chunks(self, records: Iterable[ChunkRecord]) -> List[str]:
         return await asyncio.to_thread(self._insert_chunks_sync, list(records))
 
+    async def list_ids(self) -> Set[str]:
+        return await asyncio.to_thread(self._list_ids_sync)
+
     async def search(
         self,
         embedding: List[float],
@@ -47,6 +49,62 @@ class ChromaStore:
     ) -> List[Dict[str, object]]:
         return await asyncio.to_thread(self._search_sync, embedding, top_k)
 
+    async def search_many(
+        self,
+        embeddings: List[List[float]],
+        top_k: int = 5,
+    ) -> List[List[Dict[str, object]]]:
+        return await asyncio.to_thread(self._search_many_sync, embeddings, top_k)
+
+    async def begin_version(
+        self,
+        copy_live: bool = True,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> str:
+        """Create the next versioned collection and direct writes to it.
+
+        The live collection keeps serving searches until
+        ``activate_version`` flips the alias. ``copy_live`` copies the stored
+        embeddings of the live chunks, except ``skip_ids``, into the new
+        version; nothing is re-embedded, but Chroma has no cheap clone, so
+        the copy still costs time proportional to the collection size.
+        """
+        return await asyncio.to_thread(self._begin_version_sync, copy_live, skip_ids)
+
+    async def activate_version(self, expected_count: Optional[int] = None) -> str:
+        return await asyncio.to_thread(self._activate_version_sync, expected_count)
+
+    async def abort_version(self) -> None:
+        await asyncio.to_thread(self._abort_version_sync)
+
+    async def collect_garbage(self, grace_seconds: float) -> List[str]:
+        return await asyncio.to_thread(self._collect_garbage_sync, grace_seconds)
+
+    def live_version(self) -> str:
+        return self._aliases.watch_live_name() or self._collection_name
+
+    def index_version(self) -> str:
+        try:
+            return str(os.stat(self._version_path()).st_mtime_ns)
+        except FileNotFoundError:
+            return ""
+
+    def mark_indexed(self) -> None:
+        os.makedirs(self._path, exist_ok=True)
+        with open(self._version_path(), "w", encoding="utf-8") as handle:
+            handle.write(uuid.uuid4().hex)
+
+    async def close(self) -> None:
+        self._collection = None
+        self._staging = None
+        self._client = None
+
+    def _version_path(self) -> str:
+        return os.path.join(self._path, "index_version")
+
+    def _live_name(self) -> str:
+        return self._aliases.live_name() or self._collection_name
+
     def _get_client(self) -> ClientAPI:
         if self._client is None:
             os.makedirs(self._path, exist_ok=True)
@@ -65,27 +123,145 @@ class ChromaStore:
             )
         return self._client
 
+    def _get_collection(self) -> Collection:
+        mtime = self._aliases.mtime()
+        if self._collection is None or mtime != self._aliases_seen:
+            name = self._live_name()
+            if self._collection is None or self._collection.name != name:
+                if self._collection is not None:
+                    logger.info("Switching to collection version: name=%s", name)
+                self._collection = self._get_client().get_or_create_collection(
+                    name,
+                    metadata={"hnsw:space": "cosine"},
+                )
+            self._aliases_seen = mtime
+        return self._collection
+
+    def _write_collection(self) -> Collection:
+        return self._staging or self._get_collection()
+
+    def _begin_version_sync(
+        self,
+        copy_live: bool,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> str:
+        client = self._get_client()
+        # Chroma names allow only [a-zA-Z0-9._-], so versions are "name-vN".
+        name = self._aliases.allocate_version()
+        try:
+            client.delete_collection(name)
+        except ValueError:
+            pass
+        staging = client.create_collection(name, metadata={"hnsw:space": "cosine"})
+        started = time.monotonic()
+        skipped = 0
+        if copy_live:
+            skipped = self._copy_collection(self._get_collection(), staging, skip_ids)
+        self._staging = staging
+        logger.info(
+            "Building collection version: name=%s copied=%s skipped=%s copy_ms=%s",
+            name,
+            staging.count(),
+            skipped,
+            int((time.monotonic() - started) * 1000),
+        )
+        return name
+
+    def _copy_collection(
+        self,
+        source: Collection,
+        target: Collection,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> int:
+        """Copy all chunks but ``skip_ids``; return how many were skipped."""
+        # Fetching by id avoids OFFSET scans, which grow with every page, and
+        # never reads the chunks that are about to be removed.
+        all_ids = source.get(include=[])["ids"]
+        ids = [chunk_id for chunk_id in all_ids if chunk_id not in (skip_ids or ())]
+        page_size = 1000
+        for start in range(0, len(ids), page_size):
+            page = source.get(
+                ids=ids[start : start + page_size],
+                include=["embeddings", "documents", "metadatas"],
+            )
+            target.add(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=page["metadatas"],
+            )
+        return len(all_ids) - len(ids)
+
+    def _activate_version_sync(self, expected_count: Optional[int]) -> str:
+        staging = self._staging
+        if staging is None:
+            raise RuntimeError("No collection version is being built")
+        count = staging.count()
+        if expected_count is not None and count != expected_count:
+            raise RuntimeError(
+                f"Collection {staging.name} has {count} chunks, "
+                f"expected {expected_count}"
+            )
+        if count:
+            sample = staging.get(limit=1, include=["embeddings"])
+            hits = staging.query(
+                query_embeddings=[sample["embeddings"][0]],
+                n_results=1,
+            )
+            if not hits.get("ids", [[]])[0]:
+                raise RuntimeError(f"Smoke query failed on {staging.name}")
+
+        previous = self._live_name()
+        self._aliases.activate(staging.name, previous)
+        self._collection = staging
+        self._aliases_seen = self._aliases.mtime()
+        self._staging = None
+        logger.info(
+            "Activated collection version: name=%s chunks=%s previous=%s",
+            staging.name,
+            count,
+            previous,
+        )
+        return staging.name
+
+    def _abort_version_sync(self) -> None:
+        staging = self._staging
+        self._staging = None
+        if staging is None:
+            return
+        try:
+            self._get_client().delete_collection(staging.name)
+        except ValueError:
+            pass
+        logger.warning("Discarded collection version: name=%s", staging.name)
+
+    def _collect_garbage_sync(self, grace_seconds: float) -> List[str]:
+        dropped = self._aliases.expired(grace_seconds)
+        for name in dropped:
+            try:
+                self._get_client().delete_collection(name)
+            except ValueError:
+                pass
+        if dropped:
+            self._aliases.forget(dropped)
+            logger.info("Dropped old collection versions: names=%s", dropped)
+        return dropped
+
     def _ensure_collection_sync(self, drop_existing: bool = False) -> None:
         if drop_existing:
             self._hard_reset_persist_dir()
-        client = self._get_client()
-        client.get_or_create_collection(
-            self._collection_name,
-            metadata={"hnsw:space": "cosine"},
-        )
+        self._get_collection()
 
     def _insert_chunks_sync(self, items: List[ChunkRecord]) -> List[str]:
         if not items:
             return []
-        collection = self._get_client().get_or_create_collection(
-            self._collection_name,
-            metadata={"hnsw:space": "cosine"},
-        )
+        collection = self._write_collection()
         ids = [item.chunk_id or str(uuid.uuid4()) for item in items]
         documents = [item.text for item in items]
         metadatas = [{"source": item.source} for item in items]
         embeddings = [item.embedding for item in items]
-        collection.add(
+        # Upsert so re-indexing content-addressed ids is idempotent.
+        collection.upsert(
             ids=ids,
             documents=documents,
             metadatas=metadatas,
@@ -93,37 +269,51 @@ class ChromaStore:
         )
         return ids
 
+    def _list_ids_sync(self) -> Set[str]:
+        return set(self._write_collection().get(include=[])["ids"])
+
     def _search_sync(
         self,
         embedding: List[float],
         top_k: int,
     ) -> List[Dict[str, object]]:
-        collection = self._get_client().get_or_create_collection(
-            self._collection_name,
-            metadata={"hnsw:space": "cosine"},
-        )
+        return self._search_many_sync([embedding], top_k)[0]
+
+    def _search_many_sync(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+    ) -> List[List[Dict[str, object]]]:
+        if not embeddings:
+            return []
+        collection = self._get_collection()
         results = collection.query(
-            query_embeddings=[embedding],
+            query_embeddings=embeddings,
             n_results=top_k,
             include=["documents", "metadatas", "distances"],
         )
-        hits: List[Dict[str, object]] = []
-        ids = results.get("ids", [[]])[0]
-        documents = results.get("documents", [[]])[0]
-        metadatas = results.get("metadatas", [[]])[0]
-        distances = results.get("distances", [[]])[0]
-        for idx, doc, meta, dist in zip(ids, documents, metadatas, distances):
-            hits.append(
-                {
-                    "id": idx,
-                    "score": dist,
-                    "text": doc,
-                    "source": (meta or {}).get("source"),
-                }
-            )
-        return hits
+        batches: List[List[Dict[str, object]]] = []
+        for row in range(len(embeddings)):
+            hits: List[Dict[str, object]] = []
+            ids = (results.get("ids") or [[]])[row]
+            documents = (results.get("documents") or [[]])[row]
+            metadatas = (results.get("metadatas") or [[]])[row]
+            distances = (results.get("distances") or [[]])[row]
+            for idx, doc, meta, dist in zip(ids, documents, metadatas, distances):
+                hits.append(
+                    {
+                        "id": idx,
+                        "score": dist,
+                        "text": doc,
+                        "source": (meta or {}).get("source"),
+                    }
+                )
+            batches.append(hits)
+        return batches
 
     def _hard_reset_persist_dir(self) -> None:
+        self._collection = None
+        self._staging = None
         if self._client is not None:
             try:
                 self._client.reset()
@@ -0,0 +1,134 @@
+import logging
+import os
+from typing import Dict, Optional
+
+from openai import AsyncOpenAI
+
+from app.db.chat_state import (
+    ChatStateStore,
+    MemoryChatStateStore,
+    create_chat_state_store,
+)
+
+from app.services.answer_cache import AnswerCache
+from app.services.assistant_profile import ProfileStore
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_client import EmbeddingClient
+from app.services.gpt_client import GPTClient
+from app.services.lexical_index import LexicalIndex
+from app.services.prompt_builder import PromptBuilder
+from app.services.rate_limit import CallLimiter
+from app.services.scheduler import ChatScheduler
+from app.services.summarizer import TicketSummarizer
+from app.services.vector_store import VectorStore, create_vector_store
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Process-wide clients shared by all handlers.
+
+    Created once in ``app.bot.main`` and injected into handlers through the
+    dispatcher workflow data under the ``services`` key.
+    """
+
+    def __init__(
+        self,
+        gpt: GPTClient,
+        embedder: EmbeddingClient,
+        store: VectorStore,
+        answer_cache: Optional[AnswerCache] = None,
+        openai_client: Optional[AsyncOpenAI] = None,
+        lexical: Optional[LexicalIndex] = None,
+        summarizer: Optional[TicketSummarizer] = None,
+        scheduler: Optional[ChatScheduler] = None,
+        chat_state: Optional[ChatStateStore] = None,
+        profile: Optional[ProfileStore] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+    ) -> None:
+        self._openai_client = openai_client
+        self.gpt = gpt
+        self.embedder = embedder
+        self.store = store
+        self.answer_cache = answer_cache
+        self.lexical = lexical
+        self.summarizer = summarizer
+        self.scheduler = scheduler
+        self.chat_state = chat_state or MemoryChatStateStore()
+        self.profile = profile or ProfileStore.from_env()
+        self.prompt_builder = prompt_builder or PromptBuilder()
+
+    @classmethod
+    def create(cls, api_key: Optional[str] = None) -> "ServiceContainer":
+        key = api_key or os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        openai_client = AsyncOpenAI(api_key=key)
+        store = create_vector_store()
+        profile = ProfileStore.from_env()
+        prompt_builder = PromptBuilder.from_env()
+        gpt = GPTClient(
+            client=openai_client,
+            limiter=CallLimiter.from_env("OPENAI_CHAT", default_concurrency=8),
+        )
+        return cls(
+            gpt=gpt,
+            embedder=EmbeddingClient(
+                client=openai_client,
+                cache=EmbeddingCache.from_env(),
+                limiter=CallLimiter.from_env(
+                    "OPENAI_EMBED_QUERY", default_concurrency=8
+                ),
+            ),
+            store=store,
+            # Cached answers depend on both the index and the system prompt.
+            answer_cache=AnswerCache.from_env(
+                version_source=lambda: (
+                    f"{store.index_version()}:{profile.current.version}"
+                )
+            ),
+            openai_client=openai_client,
+            lexical=LexicalIndex.from_env(),
+            # Summarize before history has to compete with retrieved context.
+            summarizer=TicketSummarizer.from_env(
+                gpt,
+                token_threshold=prompt_builder.budget - prompt_builder.context_tokens,
+            ),
+            scheduler=ChatScheduler.from_env(),
+            chat_state=create_chat_state_store(),
+            profile=profile,
+            prompt_builder=prompt_builder,
+        )
+
+    async def start(self) -> None:
+        await self.store.ensure_collection()
+        await self.profile.start()
+        logger.info("Services started")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats: Dict[str, Dict[str, float]] = {}
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        if self.gpt.limiter is not None:
+            stats["chat_calls"] = self.gpt.limiter.stats()
+        if self.embedder.limiter is not None:
+            stats["embed_calls"] = self.embedder.limiter.stats()
+        stats["chat_state"] = self.chat_state.stats()
+        return stats
+
+    async def close(self) -> None:
+        if self.scheduler is not None:
+            await self.scheduler.close()
+        logger.info("Service stats: %s", self.stats())
+        await self.profile.close()
+        if self.summarizer is not None:
+            await self.summarizer.close()
+        await self.gpt.close()
+        await self.embedder.close()
+        await self.store.close()
+        if self.answer_cache is not None:
+            logger.info("Answer cache stats: %s", self.answer_cache.stats())
+        if self._openai_client is not None:
+            await self._openai_client.close()
+        logger.info("Services closed")
@@ -1,10 +1,23 @@
+import multiprocessing
 import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Iterable, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import docx
+import pypdf
 from docx import Document as DocxDocument
 from pypdf import PdfReader
 
+from app.services.text_cache import ParsedTextCache
+
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+# Formats whose extraction is CPU-bound: run in worker processes and cached.
+POOLED_EXTENSIONS = {".pdf", ".docx"}
+# Bump when extraction output changes so cached text is re-parsed.
+PARSER_VERSION = f"1/pypdf-{pypdf.__version__}/python-docx-{docx.__version__}"
+
 
 @dataclass(frozen=True)
 class ParsedDocument:
@@ -12,28 +25,111 @@ class ParsedDocument:
     text: str
 
 
-def load_documents_from_dir(path: str) -> List[ParsedDocument]:
-    docs: List[ParsedDocument] = []
-    for entry in _iter_files(path):
-        text = _read_file(entry)
-        if text.strip():
-            docs.append(ParsedDocument(source=os.path.basename(entry), text=text))
-    return docs
+def get_parse_workers() -> int:
+    return int(os.getenv("DOC_PARSE_WORKERS", "0")) or os.cpu_count() or 1
 
 
-def _iter_files(path: str) -> Iterable[str]:
+def iter_document_paths(path: str) -> Iterator[str]:
+    """Yield supported files under ``path``, recursing into subdirectories."""
     if not os.path.isdir(path):
-        return []
-    for name in os.listdir(path):
-        full_path = os.path.join(path, name)
-        if os.path.isdir(full_path):
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+def load_documents_from_dir(
+    path: str,
+    workers: Optional[int] = None,
+    cache: Optional[ParsedTextCache] = None,
+) -> Iterator[ParsedDocument]:
+    """Yield documents under ``path`` as they finish parsing.
+
+    PDF and DOCX extraction runs in a process pool with at most two files per
+    worker in flight, so memory holds a handful of documents rather than the
+    whole folder. Text files are read in this process. Documents are yielded
+    in completion order; ``source`` is the path relative to ``path``.
+    With ``cache``, PDF and DOCX text is looked up before extraction and
+    stored after it.
+    """
+    pooled: List[str] = []
+    for entry in iter_document_paths(path):
+        if os.path.splitext(entry)[1].lower() in POOLED_EXTENSIONS:
+            pooled.append(entry)
             continue
-        ext = os.path.splitext(name)[1].lower()
-        if ext in {".pdf", ".docx", ".txt"}:
-            yield full_path
+        document = _to_document(path, entry, _read_file(entry))
+        if document is not None:
+            yield document
+
+    workers = min(workers or get_parse_workers(), len(pooled))
+    if workers <= 1:
+        for entry in pooled:
+            document = _to_document(path, entry, _read_file(entry, cache))
+            if document is not None:
+                yield document
+        return
+
+    # Spawned workers do not inherit the caller's threads or event loop.
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    queue = iter(pooled)
+    pending: Dict[Future, str] = {}
+    cached: List[Tuple[str, str]] = []
 
+    def submit_next() -> None:
+        # One entry per call, so cache hits and pool jobs share the same
+        # window of ``workers * 2`` documents; misses go to the pool.
+        entry = next(queue, None)
+        if entry is None:
+            return
+        text = cache.get(entry) if cache is not None else None
+        if text is not None:
+            cached.append((entry, text))
+        else:
+            pending[executor.submit(_extract_text, entry)] = entry
 
-def _read_file(path: str) -> str:
+    try:
+        for _ in range(workers * 2):
+            submit_next()
+        while pending or cached:
+            if cached:
+                entry, text = cached.pop(0)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(iter(done))
+                entry = pending.pop(future)
+                text = future.result()
+                if cache is not None:
+                    cache.put(entry, text)
+            submit_next()
+            document = _to_document(path, entry, text)
+            if document is not None:
+                yield document
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _to_document(root: str, path: str, text: str) -> Optional[ParsedDocument]:
+    if not text.strip():
+        return None
+    source = os.path.relpath(path, root).replace(os.sep, "/")
+    return ParsedDocument(source=source, text=text)
+
+
+def _read_file(path: str, cache: Optional[ParsedTextCache] = None) -> str:
+    if cache is None or os.path.splitext(path)[1].lower() not in POOLED_EXTENSIONS:
+        return _extract_text(path)
+    text = cache.get(path)
+    if text is None:
+        text = _extract_text(path)
+        cache.put(path, text)
+    return text
+
+
+def _extract_text(path: str) -> str:
     ext = os.path.splitext(path)[1].lower()
     if ext == ".pdf":
         return _read_pdf(path)
@@ -45,13 +141,16 @@ def _read_file(path: str) -> str:
 
 
 def _read_pdf(path: str) -> str:
-    reader = PdfReader(path)
+    # Passing an open file keeps pypdf reading objects on demand instead of
+    # loading the whole file into memory first; pages are extracted one by one.
     parts: List[str] = []
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        if text:
-            parts.append(text)
-    return "\n".join(parts)
+    with open(path, "rb") as handle:
+        reader = PdfReader(handle)
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            if text:
+                parts.append(text)
+    return "\n\f\n".join(parts)
 
 
 def _read_docx(path: str) -> str:
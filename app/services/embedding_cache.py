@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def make_key(model: str, text: str) -> CacheKey:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return model, digest
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model, normalized text hash).
+
+    The memory tier is a bounded LRU. The optional SQLite tier survives
+    restarts and is shared by the bot and the ingest command.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 0,
+        path: Optional[str] = None,
+        max_disk_entries: int = 200_000,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._path = path
+        self._max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[CacheKey, Tuple[float, List[float]]]" = (
+            OrderedDict()
+        )
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        return cls(
+            max_entries=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+            ttl_seconds=float(os.getenv("EMBED_CACHE_TTL_SECONDS", "0")),
+            path=os.getenv("EMBED_CACHE_PATH", "./data/cache/embeddings.db")
+            or None,
+            max_disk_entries=int(os.getenv("EMBED_CACHE_DISK_SIZE", "200000")),
+        )
+
+    async def get_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+    ) -> List[Optional[List[float]]]:
+        keys = [make_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        missing: List[int] = []
+        now = time.time()
+        for idx, key in enumerate(keys):
+            vector = self._memory_get(key, now)
+            if vector is None:
+                missing.append(idx)
+            else:
+                self.memory_hits += 1
+            results.append(vector)
+
+        if missing and self._path:
+            found = await asyncio.to_thread(
+                self._disk_get_many, [keys[idx] for idx in missing], now
+            )
+            for idx in missing:
+                vector = found.get(keys[idx])
+                if vector is not None:
+                    self.disk_hits += 1
+                    results[idx] = vector
+                    self._memory_put(keys[idx], vector, now)
+
+        self.misses += sum(1 for vector in results if vector is None)
+        return results
+
+    async def put_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+        vectors: Sequence[List[float]],
+    ) -> None:
+        now = time.time()
+        items = []
+        for text, vector in zip(texts, vectors):
+            key = make_key(model, text)
+            self._memory_put(key, vector, now)
+            items.append((key, vector))
+        if items and self._path:
+            await asyncio.to_thread(self._disk_put_many, items, now)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+
+    async def close(self) -> None:
+        logger.info("Embedding cache stats: %s", self.stats())
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self._ttl) and now - created_at > self._ttl
+
+    def _memory_get(self, key: CacheKey, now: float) -> Optional[List[float]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, vector = entry
+        if self._expired(created_at, now):
+            del self._memory[key]
+            self.evictions += 1
+            return None
+        self._memory.move_to_end(key)
+        return vector
+
+    def _memory_put(self, key: CacheKey, vector: List[float], now: float) -> None:
+        if self._max_entries <= 0:
+            return
+        self._memory[key] = (now, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self._path or "")
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, "
+                "digest TEXT NOT NULL, "
+                "vector BLOB NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (model, digest))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embeddings_created_at "
+                "ON embeddings (created_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _disk_get_many(
+        self,
+        keys: List[CacheKey],
+        now: float,
+    ) -> Dict[CacheKey, List[float]]:
+        found: Dict[CacheKey, List[float]] = {}
+        with self._lock:
+            conn = self._get_conn()
+            for model, digest in keys:
+                row = conn.execute(
+                    "SELECT vector, created_at FROM embeddings "
+                    "WHERE model = ? AND digest = ?",
+                    (model, digest),
+                ).fetchone()
+                if row is None:
+                    continue
+                blob, created_at = row
+                if self._expired(created_at, now):
+                    continue
+                found[(model, digest)] = array("f", blob).tolist()
+        return found
+
+    def _disk_put_many(
+        self,
+        items: List[Tuple[CacheKey, List[float]]],
+        now: float,
+    ) -> None:
+        rows = [
+            (model, digest, array("f", vector).tobytes(), now)
+            for (model, digest), vector in items
+        ]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, digest, vector, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            if self._ttl:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE created_at < ?",
+                    (now - self._ttl,),
+                )
+            conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN ("
+                "SELECT rowid FROM embeddings ORDER BY created_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self._max_disk_entries,),
+            )
+            conn.commit()
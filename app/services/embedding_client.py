@@ -1,27 +1,71 @@
 import os
+from contextlib import AbstractAsyncContextManager, nullcontext
 from typing import List, Optional
 
 from openai import AsyncOpenAI
 
+from app.services.embedding_cache import EmbeddingCache
+from app.services.rate_limit import CallLimiter
+
 
 class EmbeddingClient:
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
+        client: Optional[AsyncOpenAI] = None,
+        cache: Optional[EmbeddingCache] = None,
+        limiter: Optional[CallLimiter] = None,
     ) -> None:
-        key = api_key or os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise RuntimeError("OPENAI_API_KEY is not set")
+        self._owns_client = client is None
+        if client is None:
+            key = api_key or os.getenv("OPENAI_API_KEY")
+            if not key:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            client = AsyncOpenAI(api_key=key)
 
-        self._client = AsyncOpenAI(api_key=key)
+        self._client = client
         self._model = model or os.getenv(
             "OPENAI_EMBED_MODEL", "text-embedding-3-small"
         )
+        self._cache = cache
+        self._limiter = limiter
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        return self._cache
+
+    @property
+    def limiter(self) -> Optional[CallLimiter]:
+        return self._limiter
 
     async def embed(self, texts: List[str]) -> List[List[float]]:
-        response = await self._client.embeddings.create(
-            model=self._model,
-            input=texts,
-        )
+        if self._cache is None:
+            return await self._embed_remote(texts)
+
+        cached = await self._cache.get_many(self._model, texts)
+        missing = [idx for idx, vector in enumerate(cached) if vector is None]
+        if missing:
+            missing_texts = [texts[idx] for idx in missing]
+            fresh = await self._embed_remote(missing_texts)
+            await self._cache.put_many(self._model, missing_texts, fresh)
+            for idx, vector in zip(missing, fresh):
+                cached[idx] = vector
+        return [vector for vector in cached if vector is not None]
+
+    def _slot(self) -> AbstractAsyncContextManager:
+        return self._limiter.slot() if self._limiter is not None else nullcontext()
+
+    async def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        async with self._slot():
+            response = await self._client.embeddings.create(
+                model=self._model,
+                input=texts,
+            )
         return [item.embedding for item in response.data]
+
+    async def close(self) -> None:
+        if self._cache is not None:
+            await self._cache.close()
+        if self._owns_client:
+            await self._client.close()
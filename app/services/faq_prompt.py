@@ -1,8 +1,4 @@
-from app.services.assistant_profile import load_assistant_profile
-
-
-def build_system_prompt() -> str:
-    profile = load_assistant_profile()
+def build_system_prompt(profile: str) -> str:
     return (
         f"{profile}\n\n"
         "Use the conversation history and the provided context to answer. "
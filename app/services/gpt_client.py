@@ -1,7 +1,16 @@
+import asyncio
 import os
-from typing import Optional, TypedDict
+from contextlib import AbstractAsyncContextManager, nullcontext
+from typing import AsyncIterator, Optional, TypedDict
 
 from openai import AsyncOpenAI
+from openai.types import CompletionUsage
+
+from app.services.rate_limit import CallLimiter
+
+
+# Queued by the stream reader after the last delta.
+_STREAM_END = object()
 
 
 class GPTMeta(TypedDict, total=False):
@@ -9,6 +18,7 @@ class GPTMeta(TypedDict, total=False):
     request_id: Optional[str]
     model: str
     prompt_tokens: Optional[int]
+    cached_tokens: Optional[int]
     completion_tokens: Optional[int]
     total_tokens: Optional[int]
 
@@ -18,22 +28,36 @@ class GPTClient:
         self,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
+        client: Optional[AsyncOpenAI] = None,
+        limiter: Optional[CallLimiter] = None,
     ) -> None:
-        key = api_key or os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise RuntimeError("OPENAI_API_KEY is not set")
+        self._owns_client = client is None
+        if client is None:
+            key = api_key or os.getenv("OPENAI_API_KEY")
+            if not key:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            client = AsyncOpenAI(api_key=key)
 
-        self._client = AsyncOpenAI(api_key=key)
+        self._client = client
         self._model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self._limiter = limiter
+
+    @property
+    def limiter(self) -> Optional[CallLimiter]:
+        return self._limiter
+
+    def _slot(self) -> AbstractAsyncContextManager:
+        return self._limiter.slot() if self._limiter is not None else nullcontext()
 
     async def chat(self, user_text: str, system_prompt: str) -> tuple[str, GPTMeta]:
-        raw_response = await self._client.chat.completions.with_raw_response.create(
-            model=self._model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_text},
-            ],
-        )
+        async with self._slot():
+            raw_response = await self._client.chat.completions.with_raw_response.create(
+                model=self._model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_text},
+                ],
+            )
 
         response = raw_response.parse()
         message = response.choices[0].message
@@ -45,8 +69,85 @@ class GPTClient:
             "model": response.model,
         }
         if usage:
-            meta["prompt_tokens"] = usage.prompt_tokens
-            meta["completion_tokens"] = usage.completion_tokens
-            meta["total_tokens"] = usage.total_tokens
+            _fill_usage(meta, usage)
 
         return message.content or "", meta
+
+    async def stream_chat(
+        self,
+        user_text: str,
+        system_prompt: str,
+        meta: Optional[GPTMeta] = None,
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas as they arrive.
+
+        ``meta`` is filled in place with the same fields as ``chat`` once the
+        stream is exhausted. The upstream stream is read by a separate task
+        into a queue, so the limiter slot is released as soon as OpenAI
+        finishes, however slowly the caller consumes the deltas.
+        """
+        queue: "asyncio.Queue[object]" = asyncio.Queue()
+        reader = asyncio.create_task(
+            self._read_stream(user_text, system_prompt, meta, queue)
+        )
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not reader.done():
+                reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+
+    async def _read_stream(
+        self,
+        user_text: str,
+        system_prompt: str,
+        meta: Optional[GPTMeta],
+        queue: "asyncio.Queue[object]",
+    ) -> None:
+        try:
+            async with self._slot():
+                stream = await self._client.chat.completions.create(
+                    model=self._model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_text},
+                    ],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                if meta is not None:
+                    meta["status_code"] = stream.response.status_code
+                    meta["request_id"] = stream.response.headers.get("x-request-id")
+                async for chunk in stream:
+                    if meta is not None:
+                        meta["model"] = chunk.model
+                        if chunk.usage:
+                            _fill_usage(meta, chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        queue.put_nowait(delta)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        else:
+            queue.put_nowait(_STREAM_END)
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self._client.close()
+
+
+def _fill_usage(meta: GPTMeta, usage: CompletionUsage) -> None:
+    meta["prompt_tokens"] = usage.prompt_tokens
+    meta["completion_tokens"] = usage.completion_tokens
+    meta["total_tokens"] = usage.total_tokens
+    # Prompt tokens served from the provider's prefix cache.
+    details = usage.prompt_tokens_details
+    meta["cached_tokens"] = details.cached_tokens if details else None
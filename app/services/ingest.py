@@ -1,17 +1,36 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import re
+import time
 from dataclasses import dataclass
-from typing import Dict, Iterable, List
-
-from app.services.chroma_store import ChromaStore, ChunkRecord
-from app.services.doc_parser import load_documents_from_dir
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.services.doc_parser import (
+    PARSER_VERSION,
+    ParsedDocument,
+    iter_document_paths,
+    load_documents_from_dir,
+)
+from app.services.embedding_cache import EmbeddingCache
 from app.services.embedding_client import EmbeddingClient
-from app.services.qa_normalizer import QAPair, normalize_text_to_pairs
+from app.services.gpt_client import GPTClient
+from app.services.lexical_index import BM25Index, get_bm25_path
+from app.services.qa_normalizer import QAPair, normalize_text_with_meta
+from app.services.rate_limit import TokenBucket
+from app.services.retry import with_backoff
+from app.services.text_cache import ParsedTextCache
+from app.services.tokens import CHARS_PER_TOKEN, estimate_tokens
+from app.services.vector_store import ChunkRecord, VectorStore, create_vector_store
 
 
 logger = logging.getLogger(__name__)
 
+HEADING_RE = re.compile(r"^(#{1,6}\s+\S|\d+(\.\d+)*[.)]?\s+\S.{0,60}$)")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
 
 @dataclass(frozen=True)
 class ParsedQA:
@@ -19,6 +38,13 @@ class ParsedQA:
     pairs: List[QAPair]
 
 
+@dataclass(frozen=True)
+class PendingChunk:
+    chunk_id: str
+    text: str
+    source: str
+
+
 def default_docs_dir() -> str:
     return os.getenv("DOCS_DIR", "./data/docs")
 
@@ -30,50 +56,337 @@ def default_pairs_path() -> str:
 async def parse_documents(
     docs_dir: str,
     output_path: str,
+    incremental: bool = False,
+    refresh_cache: bool = False,
 ) -> List[ParsedQA]:
     logger.info("Parsing documents: dir=%s", docs_dir)
-    documents = load_documents_from_dir(docs_dir)
-    logger.info("Found documents: count=%s", len(documents))
-    results: List[ParsedQA] = []
-    for doc in documents:
-        pairs = await normalize_text_to_pairs(doc.text)
-        results.append(ParsedQA(source=doc.source, pairs=pairs))
+    total = sum(1 for _ in iter_document_paths(docs_dir))
+    logger.info("Found documents: count=%s", total)
+
+    checkpoint_path = _checkpoint_path(output_path)
+    done = _load_checkpoint(checkpoint_path)
+    if incremental:
+        for source, entry in _load_previous_pairs(output_path).items():
+            done.setdefault(source, entry)
+    hashes: Dict[str, str] = {}
+    progress = IngestProgress(total=total)
+    semaphore = asyncio.Semaphore(_parse_concurrency())
+    # Caps parsed documents held in memory while they wait for the LLM.
+    in_flight = asyncio.Semaphore(_parse_concurrency() * 2)
+    client = GPTClient()
+
+    async def normalize(doc: ParsedDocument) -> ParsedQA:
+        digest = _text_hash(doc.text)
+        hashes[doc.source] = digest
+        cached = done.get(doc.source)
+        if cached is not None and cached[0] == digest:
+            progress.advance(reused=True)
+            return ParsedQA(source=doc.source, pairs=cached[1])
+        windows = split_into_windows(doc.text, _window_tokens())
+
+        async def normalize_window(window: str) -> Tuple[List[QAPair], int]:
+            async with semaphore:
+                pairs, meta = await with_backoff(
+                    lambda: normalize_text_with_meta(window, client)
+                )
+            return pairs, meta.get("total_tokens") or 0
+
+        window_results = await asyncio.gather(
+            *[normalize_window(window) for window in windows]
+        )
+        pairs = merge_pairs([item[0] for item in window_results])
+        _append_checkpoint(checkpoint_path, doc.source, digest, pairs)
+        progress.advance(tokens=sum(item[1] for item in window_results))
         logger.info(
-            "Normalized document: source=%s pairs=%s",
+            "Normalized document: source=%s windows=%s pairs=%s",
             doc.source,
+            len(windows),
             len(pairs),
         )
+        return ParsedQA(source=doc.source, pairs=pairs)
+
+    async def normalize_and_release(doc: ParsedDocument) -> ParsedQA:
+        try:
+            return await normalize(doc)
+        finally:
+            in_flight.release()
+
+    text_cache = ParsedTextCache.from_env(PARSER_VERSION, refresh=refresh_cache)
+    documents = _iter_documents_async(docs_dir, text_cache)
+    tasks: List["asyncio.Task[ParsedQA]"] = []
+    try:
+        async for doc in documents:
+            await in_flight.acquire()
+            tasks.append(asyncio.create_task(normalize_and_release(doc)))
+        results = list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await documents.aclose()
+        await client.close()
+        if text_cache is not None:
+            text_cache.prune_missing()
+            text_cache.close()
+    results.sort(key=lambda item: item.source)
     _write_pairs_json(results, output_path)
+    _write_manifest(_manifest_path(output_path), hashes)
+    _remove_checkpoint(checkpoint_path)
     logger.info("Saved Q/A pairs: path=%s", output_path)
     return results
 
 
+async def _iter_documents_async(
+    docs_dir: str,
+    text_cache: Optional[ParsedTextCache] = None,
+) -> AsyncIterator[ParsedDocument]:
+    """Drive the blocking document loader from a thread, one item at a time."""
+    loader = load_documents_from_dir(docs_dir, cache=text_cache)
+    try:
+        while True:
+            doc = await asyncio.to_thread(next, loader, None)
+            if doc is None:
+                return
+            yield doc
+    finally:
+        await asyncio.to_thread(loader.close)
+
+
+def split_into_windows(text: str, max_tokens: int) -> List[str]:
+    """Pack a document into windows of at most ``max_tokens`` estimated tokens.
+
+    Windows break on section headings where possible, then on paragraph and
+    page boundaries, and only split inside a paragraph when it alone is
+    larger than the budget.
+    """
+    windows: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        nonlocal current, current_tokens
+        if current:
+            windows.append("\n\n".join(current))
+        current = []
+        current_tokens = 0
+
+    for section in _split_sections(text):
+        section_tokens = sum(estimate_tokens(para) for para in section)
+        if current and current_tokens + section_tokens > max_tokens:
+            flush()
+        for paragraph in section:
+            for piece in _fit_paragraph(paragraph, max_tokens):
+                tokens = estimate_tokens(piece)
+                if current and current_tokens + tokens > max_tokens:
+                    flush()
+                current.append(piece)
+                current_tokens += tokens
+    flush()
+    return windows
+
+
+def merge_pairs(pair_lists: Iterable[List[QAPair]]) -> List[QAPair]:
+    """Concatenate per-window pairs, dropping repeated questions.
+
+    Questions are compared case- and punctuation-insensitively; for repeats
+    the longer answer wins but the first position is kept.
+    """
+    merged: List[QAPair] = []
+    positions: Dict[str, int] = {}
+    for pairs in pair_lists:
+        for pair in pairs:
+            key = _question_key(pair.question)
+            idx = positions.get(key)
+            if idx is None:
+                positions[key] = len(merged)
+                merged.append(pair)
+            elif len(pair.answer) > len(merged[idx].answer):
+                merged[idx] = QAPair(question=merged[idx].question, answer=pair.answer)
+    return merged
+
+
+def _split_sections(text: str) -> List[List[str]]:
+    sections: List[List[str]] = [[]]
+    paragraph: List[str] = []
+
+    def end_paragraph() -> None:
+        if paragraph:
+            sections[-1].append("\n".join(paragraph))
+            paragraph.clear()
+
+    for raw_line in text.replace("\f", "\n\n").splitlines():
+        line = raw_line.strip()
+        if not line:
+            end_paragraph()
+            continue
+        if _is_heading(line):
+            end_paragraph()
+            if sections[-1]:
+                sections.append([])
+        paragraph.append(line)
+    end_paragraph()
+    return [section for section in sections if section]
+
+
+def _is_heading(line: str) -> bool:
+    if len(line) > 80:
+        return False
+    if HEADING_RE.match(line):
+        return True
+    letters = [char for char in line if char.isalpha()]
+    return len(letters) >= 3 and all(char.isupper() for char in letters)
+
+
+def _fit_paragraph(paragraph: str, max_tokens: int) -> List[str]:
+    if estimate_tokens(paragraph) <= max_tokens:
+        return [paragraph]
+    pieces: List[str] = []
+    current = ""
+    for sentence in SENTENCE_RE.split(paragraph):
+        candidate = f"{current} {sentence}".strip()
+        if estimate_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if estimate_tokens(sentence) <= max_tokens:
+            current = sentence
+        else:
+            max_chars = max_tokens * CHARS_PER_TOKEN
+            pieces.extend(
+                sentence[start : start + max_chars]
+                for start in range(0, len(sentence), max_chars)
+            )
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _question_key(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", question.casefold()).split())
+
+
+class IngestProgress:
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.reused = 0
+        self.tokens = 0
+        self._started = time.monotonic()
+
+    def advance(self, tokens: int = 0, reused: bool = False) -> None:
+        self.done += 1
+        self.tokens += tokens
+        if reused:
+            self.reused += 1
+            return
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        fresh = self.done - self.reused
+        rate = fresh / elapsed
+        remaining = self.total - self.done
+        eta = remaining / rate if rate else 0.0
+        logger.info(
+            "Parse progress: done=%s/%s reused=%s docs_per_sec=%.2f "
+            "tokens=%s eta_sec=%.0f",
+            self.done,
+            self.total,
+            self.reused,
+            rate,
+            self.tokens,
+            eta,
+        )
+
+
 async def index_pairs(
     pairs_path: str,
     reset: bool = False,
+    incremental: bool = False,
 ) -> int:
-    logger.info("Indexing pairs: path=%s reset=%s", pairs_path, reset)
+    logger.info(
+        "Indexing pairs: path=%s reset=%s incremental=%s",
+        pairs_path,
+        reset,
+        incremental,
+    )
     parsed = _load_pairs_json(pairs_path)
     logger.info("Loaded sources: count=%s", len(parsed))
-    store = ChromaStore()
-    await store.ensure_collection(drop_existing=reset)
-    embedder = EmbeddingClient()
+    store = create_vector_store()
+    chunks = _collect_chunks(parsed)
+    stale: List[str] = []
+    if not reset:
+        live_ids = await store.list_ids()
+        unchanged = live_ids.issuperset(chunks.keys())
+        if unchanged and (not incremental or live_ids == chunks.keys()):
+            logger.info("Index is up to date: chunks=%s", len(live_ids))
+            live = store.live_version()
+            if live and not os.path.exists(get_bm25_path(live)):
+                _write_lexical_index(live, chunks)
+            return 0
+        if incremental:
+            stale = sorted(live_ids - chunks.keys())
+    # Unchanged chunks are carried over with their stored embeddings and
+    # stale ones are left behind, so only new chunks are embedded.
+    version = await store.begin_version(copy_live=not reset, skip_ids=set(stale))
+    embedder = EmbeddingClient(cache=EmbeddingCache.from_env())
 
     total = 0
-    texts: List[str] = []
-    sources: List[str] = []
+    try:
+        existing = await store.list_ids()
+        pending = [
+            chunk for chunk in chunks.values() if chunk.chunk_id not in existing
+        ]
+        total = await _embed_and_insert(store, embedder, pending)
+        # Written before the alias flips, so the BM25 file and the vectors of
+        # a version become live together.
+        _write_lexical_index(version, chunks)
+        await store.activate_version(expected_count=len(existing | chunks.keys()))
+    except BaseException:
+        await store.abort_version()
+        _remove_lexical_index(version)
+        raise
+    finally:
+        await embedder.close()
+    store.mark_indexed()
+    for name in await store.collect_garbage(_version_grace_seconds()):
+        _remove_lexical_index(name)
+    logger.info(
+        "Indexed chunks: added=%s removed=%s unchanged=%s",
+        total,
+        len(stale),
+        len(chunks) - len(pending),
+    )
+    return total
+
+
+def chunk_id(source: str, text: str) -> str:
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def _write_lexical_index(version: str, chunks: Dict[str, PendingChunk]) -> None:
+    path = get_bm25_path(version)
+    BM25Index.build(
+        (chunk.chunk_id, chunk.text, chunk.source) for chunk in chunks.values()
+    ).save(path)
+    logger.info("Wrote BM25 index: path=%s chunks=%s", path, len(chunks))
+
+
+def _remove_lexical_index(version: str) -> None:
+    try:
+        os.remove(get_bm25_path(version))
+    except FileNotFoundError:
+        return
+    logger.info("Removed BM25 index: version=%s", version)
+
+
+def _collect_chunks(parsed: List[ParsedQA]) -> Dict[str, PendingChunk]:
+    chunks: Dict[str, PendingChunk] = {}
     for item in parsed:
         for text in _pairs_to_texts(item):
-            texts.append(text)
-            sources.append(item.source)
-            if len(texts) >= _embed_batch_size():
-                total += await _flush_batch(store, embedder, texts, sources)
-                texts = []
-                sources = []
-    if texts:
-        total += await _flush_batch(store, embedder, texts, sources)
-    logger.info("Indexed chunks: total=%s", total)
-    return total
+            cid = chunk_id(item.source, text)
+            chunks.setdefault(
+                cid, PendingChunk(chunk_id=cid, text=text, source=item.source)
+            )
+    return chunks
 
 
 def _pairs_to_texts(item: ParsedQA) -> Iterable[str]:
@@ -88,19 +401,161 @@ def _pairs_to_texts(item: ParsedQA) -> Iterable[str]:
             yield combined
 
 
-async def _flush_batch(
-    store: ChromaStore,
+async def _embed_and_insert(
+    store: VectorStore,
     embedder: EmbeddingClient,
-    texts: List[str],
-    sources: List[str],
+    pending: List[PendingChunk],
 ) -> int:
-    embeddings = await embedder.embed(texts)
-    records = [
-        ChunkRecord(embedding=emb, text=text, source=source)
-        for emb, text, source in zip(embeddings, texts, sources)
-    ]
-    await store.insert_chunks(records)
-    return len(records)
+    """Embed chunks with several requests in flight and insert them.
+
+    Embedding workers draw token-sized batches and wait on a tokens-per-minute
+    bucket; a single inserter writes to the store. Batches are inserted in the
+    order their embeddings complete, not in input order; chunk ids are content
+    hashes, so the resulting version is the same either way. The bounded
+    queue between the stages applies backpressure when inserts fall behind.
+    """
+    batches: asyncio.Queue = asyncio.Queue()
+    for batch in _token_batches(pending, _embed_batch_tokens(), _embed_batch_size()):
+        batches.put_nowait(batch)
+    concurrency = _embed_concurrency()
+    ready: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    budget = TokenBucket.per_minute(_embed_tokens_per_minute())
+
+    async def embed_worker() -> None:
+        while True:
+            try:
+                batch = batches.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await budget.acquire(sum(estimate_tokens(chunk.text) for chunk in batch))
+            embeddings = await with_backoff(
+                lambda: embedder.embed([chunk.text for chunk in batch])
+            )
+            await ready.put(
+                [
+                    ChunkRecord(
+                        embedding=emb,
+                        text=chunk.text,
+                        source=chunk.source,
+                        chunk_id=chunk.chunk_id,
+                    )
+                    for emb, chunk in zip(embeddings, batch)
+                ]
+            )
+
+    async def produce() -> None:
+        await asyncio.gather(*[embed_worker() for _ in range(concurrency)])
+        await ready.put(None)
+
+    async def consume() -> int:
+        inserted = 0
+        while True:
+            records = await ready.get()
+            if records is None:
+                return inserted
+            await store.insert_chunks(records)
+            inserted += len(records)
+            logger.info("Indexed batch: chunks=%s total=%s", len(records), inserted)
+
+    tasks = [asyncio.create_task(produce()), asyncio.create_task(consume())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return tasks[1].result()
+
+
+def _token_batches(
+    chunks: List[PendingChunk],
+    max_tokens: int,
+    max_items: int,
+) -> Iterable[List[PendingChunk]]:
+    batch: List[PendingChunk] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _manifest_path(output_path: str) -> str:
+    return os.path.join(os.path.dirname(output_path), "manifest.json")
+
+
+def _write_manifest(path: str, hashes: Dict[str, str]) -> None:
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(hashes, handle, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _load_previous_pairs(output_path: str) -> Dict[str, Tuple[str, List[QAPair]]]:
+    manifest_path = _manifest_path(output_path)
+    if not os.path.exists(manifest_path) or not os.path.exists(output_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as handle:
+        hashes = json.load(handle)
+    return {
+        item.source: (hashes[item.source], item.pairs)
+        for item in _load_pairs_json(output_path)
+        if item.source in hashes
+    }
+
+
+def _checkpoint_path(output_path: str) -> str:
+    return f"{output_path}.checkpoint.jsonl"
+
+
+def _load_checkpoint(path: str) -> Dict[str, Tuple[str, List[QAPair]]]:
+    done: Dict[str, Tuple[str, List[QAPair]]] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            pairs = [
+                QAPair(question=item["q"], answer=item["a"])
+                for item in record.get("pairs", [])
+            ]
+            done[record["source"]] = (record["hash"], pairs)
+    if done:
+        logger.info("Resuming from checkpoint: path=%s documents=%s", path, len(done))
+    return done
+
+
+def _append_checkpoint(
+    path: str,
+    source: str,
+    digest: str,
+    pairs: List[QAPair],
+) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    record = {
+        "source": source,
+        "hash": digest,
+        "pairs": [{"q": pair.question, "a": pair.answer} for pair in pairs],
+    }
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _remove_checkpoint(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
 def _write_pairs_json(parsed: List[ParsedQA], output_path: str) -> None:
@@ -158,5 +613,29 @@ def _overlap_words() -> int:
     return int(os.getenv("CHUNK_OVERLAP_WORDS", "50"))
 
 
+def _version_grace_seconds() -> float:
+    return float(os.getenv("INDEX_VERSION_GRACE_SECONDS", "600"))
+
+
+def _window_tokens() -> int:
+    return int(os.getenv("NORMALIZE_WINDOW_TOKENS", "3000"))
+
+
+def _parse_concurrency() -> int:
+    return int(os.getenv("PARSE_CONCURRENCY", "4"))
+
+
 def _embed_batch_size() -> int:
-    return int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    return int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+
+def _embed_batch_tokens() -> int:
+    return int(os.getenv("EMBED_BATCH_TOKENS", "20000"))
+
+
+def _embed_concurrency() -> int:
+    return int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+
+def _embed_tokens_per_minute() -> int:
+    return int(os.getenv("EMBED_TOKENS_PER_MINUTE", "1000000"))
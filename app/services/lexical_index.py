@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Words plus codes such as "ERR-404", "v2.1" or "A/B"; Unicode-aware for Cyrillic.
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+_SPLIT_RE = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound codes also yield their parts."""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, serialized as one JSON document."""
+
+    def __init__(
+        self,
+        docs: List[Dict[str, object]],
+        postings: Dict[str, List[Tuple[int, int]]],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self._docs = docs
+        self._postings = postings
+        self._k1 = k1
+        self._b = b
+        lengths = [int(doc["length"]) for doc in docs]
+        self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, str, str]]) -> "BM25Index":
+        """Build from ``(chunk_id, text, source)`` tuples."""
+        docs: List[Dict[str, object]] = []
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for chunk_id, text, source in chunks:
+            counts = Counter(tokenize(text))
+            row = len(docs)
+            docs.append(
+                {
+                    "id": chunk_id,
+                    "text": text,
+                    "source": source,
+                    "length": sum(counts.values()),
+                }
+            )
+            for term, count in counts.items():
+                postings[term].append((row, count))
+        return cls(docs, dict(postings))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        postings = {
+            term: [(row, count) for row, count in entries]
+            for term, entries in data["postings"].items()
+        }
+        return cls(data["docs"], postings)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"docs": self._docs, "postings": self._postings},
+                handle,
+                ensure_ascii=False,
+            )
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, object]]:
+        if not self._docs:
+            return []
+        total = len(self._docs)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            entries = self._postings.get(term)
+            if not entries:
+                continue
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            for row, count in entries:
+                length = int(self._docs[row]["length"])
+                norm = self._k1 * (1 - self._b + self._b * length / self._avg_length)
+                scores[row] += idf * count * (self._k1 + 1) / (count + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {
+                "id": self._docs[row]["id"],
+                "score": score,
+                "text": self._docs[row]["text"],
+                "source": self._docs[row]["source"],
+            }
+            for row, score in best
+        ]
+
+
+class LexicalIndex:
+    """Bot-side handle on the per-version BM25 files written by ingestion.
+
+    Each vector store version has its own BM25 file, and ``search`` takes the
+    version to read, so keyword hits are fused only with vector hits from the
+    same version. The last two versions stay loaded to cover an alias swap.
+    Loading and scoring run in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, directory: str, max_versions: int = 2) -> None:
+        self._directory = directory
+        self._max_versions = max_versions
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._missing: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["LexicalIndex"]:
+        if os.getenv("HYBRID_SEARCH", "1") != "1":
+            return None
+        return cls(get_bm25_dir())
+
+    async def search(
+        self,
+        query: str,
+        version: str,
+        top_k: int = 5,
+    ) -> List[Dict[str, object]]:
+        index = await self._get_index(version)
+        if index is None:
+            return []
+        return await asyncio.to_thread(index.search, query, top_k)
+
+    async def _get_index(self, version: str) -> Optional[BM25Index]:
+        if not version:
+            return None
+        index = self._indexes.get(version)
+        if index is not None:
+            return index
+        async with self._lock:
+            index = self._indexes.get(version)
+            if index is not None:
+                return index
+            path = os.path.join(self._directory, f"{version}.json")
+            index = await asyncio.to_thread(_load_if_exists, path)
+            if index is None:
+                if self._missing != version:
+                    logger.warning("BM25 index missing: path=%s", path)
+                    self._missing = version
+                return None
+            self._indexes[version] = index
+            while len(self._indexes) > self._max_versions:
+                self._indexes.popitem(last=False)
+            logger.info("Loaded BM25 index: path=%s chunks=%s", path, len(index))
+            return index
+
+
+def _load_if_exists(path: str) -> Optional[BM25Index]:
+    try:
+        return BM25Index.load(path)
+    except FileNotFoundError:
+        return None
+
+
+def get_bm25_dir() -> str:
+    return os.getenv("BM25_INDEX_DIR", "./data/bm25")
+
+
+def get_bm25_path(version: str) -> str:
+    return os.path.join(get_bm25_dir(), f"{version}.json")
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Dict[str, object]]],
+    limit: int,
+    k: int = 60,
+) -> List[Dict[str, object]]:
+    """Merge ranked hit lists by summing ``1 / (k + rank)`` per chunk id."""
+    fused: Dict[str, float] = defaultdict(float)
+    hits: Dict[str, Dict[str, object]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            chunk_id = str(hit.get("id"))
+            fused[chunk_id] += 1.0 / (k + rank)
+            hits.setdefault(chunk_id, hit)
+    order = sorted(fused, key=lambda chunk_id: fused[chunk_id], reverse=True)
+    return [dict(hits[chunk_id], rrf=fused[chunk_id]) for chunk_id in order[:limit]]
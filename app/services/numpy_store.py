@@ -0,0 +1,476 @@
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.vector_store import ChunkRecord, VersionAliases
+
+
+logger = logging.getLogger(__name__)
+
+# Below this many matrix elements a search is cheaper inline than in a thread.
+INLINE_SEARCH_ELEMENTS = 4_000_000
+# Rows decoded per step when scoring int8 codes, to bound temporary memory.
+DECODE_BLOCK_ROWS = 512
+
+QUANTIZATION_NONE = "none"
+QUANTIZATION_INT8 = "int8"
+QUANTIZATION_BINARY = "binary"
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+
+class _Segment:
+    """One immutable version on disk: a float32 matrix plus a side table.
+
+    If the version was written with quantization, the compact codes are held
+    in memory and the float32 matrix is only paged in for reranking.
+
+    Readers ``acquire`` the segment for the duration of a search. A segment
+    replaced by a newer version is ``retire``d and closes once its last
+    reader releases it, so a swap never pulls it from under a running query.
+    """
+
+    def __init__(self, directory: str, name: str) -> None:
+        self.name = name
+        self.matrix: np.ndarray = np.load(
+            os.path.join(directory, "vectors.npy"), mmap_mode="r"
+        )
+        self.quantization = QUANTIZATION_NONE
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        codes_path = os.path.join(directory, "codes.npy")
+        scales_path = os.path.join(directory, "scales.npy")
+        if os.path.exists(codes_path):
+            self.codes = np.load(codes_path)
+            if os.path.exists(scales_path):
+                self.quantization = QUANTIZATION_INT8
+                self.scales = np.load(scales_path)
+            else:
+                self.quantization = QUANTIZATION_BINARY
+        self._db = sqlite3.connect(
+            os.path.join(directory, "chunks.db"), check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._retired = False
+        self._closed = False
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def candidates(self, queries: np.ndarray, pool: int) -> Optional[np.ndarray]:
+        """Return the ``pool`` best rows per query by code score, or None."""
+        if self.codes is None or pool >= len(self):
+            return None
+        if self.quantization == QUANTIZATION_INT8:
+            approx = np.empty((len(self), len(queries)), dtype=np.float32)
+            for start in range(0, len(self), DECODE_BLOCK_ROWS):
+                block = self.codes[start : start + DECODE_BLOCK_ROWS]
+                approx[start : start + len(block)] = block.astype(np.float32) @ queries.T
+            approx *= self.scales[:, None]
+        else:
+            query_bits = np.packbits(queries > 0, axis=1)
+            approx = np.empty((len(self), len(queries)), dtype=np.float32)
+            for column, bits in enumerate(query_bits):
+                distance = _POPCOUNT[np.bitwise_xor(self.codes, bits)].sum(axis=1)
+                approx[:, column] = -distance.astype(np.float32)
+        return np.argpartition(-approx, pool - 1, axis=0)[:pool]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM chunks ORDER BY row").fetchall()
+        return [row[0] for row in rows]
+
+    def fetch(self, rows: Iterable[int]) -> Dict[int, Tuple[str, str, str]]:
+        rows = [int(row) for row in rows]
+        if not rows:
+            return {}
+        placeholders = ",".join("?" for _ in rows)
+        with self._lock:
+            result = self._db.execute(
+                f"SELECT row, id, text, source FROM chunks WHERE row IN ({placeholders})",
+                rows,
+            ).fetchall()
+        return {row: (chunk_id, text, source) for row, chunk_id, text, source in result}
+
+    def all_rows(self) -> List[Tuple[int, str, str, str]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT row, id, text, source FROM chunks ORDER BY row"
+            ).fetchall()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._readers += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._readers -= 1
+            if self._retired and not self._readers:
+                self._close_locked()
+
+    def retire(self) -> None:
+        """Close now if idle, otherwise when the last reader releases it."""
+        with self._lock:
+            self._retired = True
+            if not self._readers:
+                self._close_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._db.close()
+
+
+class _Staging:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.chunks: Dict[str, Tuple[np.ndarray, str, str]] = {}
+
+
+class NumpyStore:
+    """Exact cosine search over a memory-mapped, pre-normalized float32 matrix.
+
+    Each version lives in ``<path>/<name>-vN/`` as ``vectors.npy`` and a
+    ``chunks.db`` SQLite side table holding ids, texts and sources by row.
+    Versions are swapped through the same ``aliases.json`` pointer as the
+    Chroma backend.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        collection_name: Optional[str] = None,
+        quantization: Optional[str] = None,
+        rerank_factor: Optional[int] = None,
+    ) -> None:
+        self._path = path or os.getenv("NUMPY_STORE_PATH", "./data/vectors")
+        self._collection_name = collection_name or os.getenv(
+            "CHROMA_COLLECTION", "faq_chunks"
+        )
+        self._quantization = quantization or os.getenv(
+            "NUMPY_QUANTIZATION", QUANTIZATION_NONE
+        )
+        if self._quantization not in (
+            QUANTIZATION_NONE,
+            QUANTIZATION_INT8,
+            QUANTIZATION_BINARY,
+        ):
+            raise RuntimeError(f"Unknown NUMPY_QUANTIZATION: {self._quantization}")
+        self._rerank_factor = rerank_factor or int(
+            os.getenv("NUMPY_RERANK_FACTOR", "10")
+        )
+        self._aliases = VersionAliases(self._path, self._collection_name)
+        self._aliases_seen: Optional[int] = None
+        self._live: Optional[_Segment] = None
+        self._staging: Optional[_Staging] = None
+        self._load_lock = threading.Lock()
+
+    async def ensure_collection(self, drop_existing: bool = False) -> None:
+        if drop_existing and os.path.isdir(self._path):
+            await self.close()
+            shutil.rmtree(self._path)
+            logger.info("Removed vector directory: path=%s", self._path)
+        os.makedirs(self._path, exist_ok=True)
+
+    async def insert_chunks(self, records: Iterable[ChunkRecord]) -> List[str]:
+        staging = self._require_staging()
+        ids: List[str] = []
+        for record in records:
+            chunk_id = record.chunk_id or str(uuid.uuid4())
+            vector = _normalize(np.asarray(record.embedding, dtype=np.float32))
+            staging.chunks[chunk_id] = (vector, record.text, record.source)
+            ids.append(chunk_id)
+        return ids
+
+    async def list_ids(self) -> Set[str]:
+        if self._staging is not None:
+            return set(self._staging.chunks)
+        with self._use_segment() as segment:
+            return set(segment.ids()) if segment else set()
+
+    async def search(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+    ) -> List[Dict[str, object]]:
+        return (await self.search_many([embedding], top_k))[0]
+
+    async def search_many(
+        self,
+        embeddings: List[List[float]],
+        top_k: int = 5,
+    ) -> List[List[Dict[str, object]]]:
+        segment = self._live if self._aliases_seen == self._aliases.mtime() else None
+        if segment is not None and segment.matrix.size <= INLINE_SEARCH_ELEMENTS:
+            return self._search_many_sync(embeddings, top_k)
+        return await asyncio.to_thread(self._search_many_sync, embeddings, top_k)
+
+    async def begin_version(
+        self,
+        copy_live: bool = True,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> str:
+        return await asyncio.to_thread(self._begin_version_sync, copy_live, skip_ids)
+
+    async def activate_version(self, expected_count: Optional[int] = None) -> str:
+        return await asyncio.to_thread(self._activate_version_sync, expected_count)
+
+    async def abort_version(self) -> None:
+        if self._staging is not None:
+            logger.warning("Discarded vector version: name=%s", self._staging.name)
+        self._staging = None
+
+    async def collect_garbage(self, grace_seconds: float) -> List[str]:
+        return await asyncio.to_thread(self._collect_garbage_sync, grace_seconds)
+
+    def live_version(self) -> str:
+        return self._aliases.watch_live_name() or ""
+
+    def index_version(self) -> str:
+        try:
+            return str(os.stat(self._version_path()).st_mtime_ns)
+        except FileNotFoundError:
+            return ""
+
+    def mark_indexed(self) -> None:
+        os.makedirs(self._path, exist_ok=True)
+        with open(self._version_path(), "w", encoding="utf-8") as handle:
+            handle.write(uuid.uuid4().hex)
+
+    async def close(self) -> None:
+        with self._load_lock:
+            if self._live is not None:
+                self._live.retire()
+            self._live = None
+            self._aliases_seen = None
+        self._staging = None
+
+    def _version_path(self) -> str:
+        return os.path.join(self._path, "index_version")
+
+    def _require_staging(self) -> _Staging:
+        if self._staging is None:
+            raise RuntimeError("Call begin_version() before writing to NumpyStore")
+        return self._staging
+
+    def _get_segment(self) -> Optional[_Segment]:
+        mtime = self._aliases.mtime()
+        if self._live is not None and mtime == self._aliases_seen:
+            return self._live
+        with self._load_lock:
+            name = self._aliases.live_name()
+            if self._live is None or self._live.name != name:
+                previous = self._live
+                self._live = _Segment(os.path.join(self._path, name), name) if name else None
+                if previous is not None:
+                    # Searches holding the old segment finish on it first.
+                    previous.retire()
+                    logger.info("Switching to vector version: name=%s", name)
+            self._aliases_seen = mtime
+        return self._live
+
+    @contextmanager
+    def _use_segment(self) -> Iterator[Optional[_Segment]]:
+        """Yield the live segment, kept open until the block exits."""
+        while True:
+            segment = self._get_segment()
+            if segment is None:
+                yield None
+                return
+            if segment.acquire():
+                break
+            # Retired and closed between lookup and acquire; look up again.
+        try:
+            yield segment
+        finally:
+            segment.release()
+
+    def _search_many_sync(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+    ) -> List[List[Dict[str, object]]]:
+        with self._use_segment() as segment:
+            if segment is None or not len(segment) or not embeddings:
+                return [[] for _ in embeddings]
+            return self._search_segment(segment, embeddings, top_k)
+
+    def _search_segment(
+        self,
+        segment: _Segment,
+        embeddings: List[List[float]],
+        top_k: int,
+    ) -> List[List[Dict[str, object]]]:
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        k = min(top_k, len(segment))
+        candidates = segment.candidates(queries, k * self._rerank_factor)
+        if candidates is None:
+            scores = segment.matrix @ queries.T
+            if k < len(segment):
+                top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            else:
+                top = np.tile(np.arange(len(segment))[:, None], (1, len(embeddings)))
+        results: List[List[Dict[str, object]]] = []
+        for column, query in enumerate(queries):
+            if candidates is None:
+                rows = top[:, column]
+                row_scores = scores[rows, column]
+            else:
+                # Rerank the code-level candidates with full-precision vectors.
+                pool = np.sort(candidates[:, column])
+                pool_scores = segment.matrix[pool] @ query
+                best = np.argpartition(-pool_scores, k - 1)[:k]
+                rows, row_scores = pool[best], pool_scores[best]
+            order = np.argsort(-row_scores)
+            rows, row_scores = rows[order], row_scores[order]
+            fetched = segment.fetch(rows)
+            hits: List[Dict[str, object]] = []
+            for row, score in zip(rows, row_scores):
+                chunk_id, text, source = fetched[int(row)]
+                hits.append(
+                    {
+                        "id": chunk_id,
+                        "score": float(1.0 - score),
+                        "text": text,
+                        "source": source,
+                    }
+                )
+            results.append(hits)
+        return results
+
+    def _begin_version_sync(
+        self,
+        copy_live: bool,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> str:
+        staging = _Staging(self._aliases.allocate_version())
+        if copy_live:
+            with self._use_segment() as segment:
+                if segment is not None:
+                    matrix = np.asarray(segment.matrix)
+                    for row, chunk_id, text, source in segment.all_rows():
+                        if skip_ids and chunk_id in skip_ids:
+                            continue
+                        staging.chunks[chunk_id] = (np.array(matrix[row]), text, source)
+        self._staging = staging
+        logger.info(
+            "Building vector version: name=%s copied=%s",
+            staging.name,
+            len(staging.chunks),
+        )
+        return staging.name
+
+    def _activate_version_sync(self, expected_count: Optional[int]) -> str:
+        staging = self._require_staging()
+        count = len(staging.chunks)
+        if expected_count is not None and count != expected_count:
+            raise RuntimeError(
+                f"Vector version {staging.name} has {count} chunks, "
+                f"expected {expected_count}"
+            )
+        directory = os.path.join(self._path, staging.name)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        _write_segment(directory, staging, self._quantization)
+
+        segment = _Segment(directory, staging.name)
+        try:
+            if count:
+                first = np.asarray(segment.matrix[0])
+                best = int(np.argmax(segment.matrix @ first))
+                if float(segment.matrix[best] @ first) < 0.99:
+                    raise RuntimeError(f"Smoke query failed on {staging.name}")
+        finally:
+            segment.close()
+
+        previous = self._aliases.live_name()
+        self._aliases.activate(staging.name, previous)
+        self._staging = None
+        self._get_segment()
+        logger.info(
+            "Activated vector version: name=%s chunks=%s quantization=%s previous=%s",
+            staging.name,
+            count,
+            self._quantization,
+            previous,
+        )
+        return staging.name
+
+    def _collect_garbage_sync(self, grace_seconds: float) -> List[str]:
+        dropped = self._aliases.expired(grace_seconds)
+        for name in dropped:
+            shutil.rmtree(os.path.join(self._path, name), ignore_errors=True)
+        if dropped:
+            self._aliases.forget(dropped)
+            logger.info("Dropped old vector versions: names=%s", dropped)
+        return dropped
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes; ``codes * scales[:, None]`` approximates rows."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(matrix: np.ndarray) -> np.ndarray:
+    """Sign bits packed eight to a byte, compared by Hamming distance."""
+    return np.packbits(matrix > 0, axis=1)
+
+
+def _write_segment(directory: str, staging: _Staging, quantization: str) -> None:
+    items = list(staging.chunks.items())
+    if items:
+        matrix = np.vstack([vector for _id, (vector, _text, _source) in items])
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    matrix = matrix.astype(np.float32)
+    np.save(os.path.join(directory, "vectors.npy"), matrix)
+    if items and quantization == QUANTIZATION_INT8:
+        codes, scales = quantize_int8(matrix)
+        np.save(os.path.join(directory, "codes.npy"), codes)
+        np.save(os.path.join(directory, "scales.npy"), scales)
+    elif items and quantization == QUANTIZATION_BINARY:
+        np.save(os.path.join(directory, "codes.npy"), quantize_binary(matrix))
+    db = sqlite3.connect(os.path.join(directory, "chunks.db"))
+    try:
+        db.execute(
+            "CREATE TABLE chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "text TEXT NOT NULL, source TEXT NOT NULL)"
+        )
+        db.executemany(
+            "INSERT INTO chunks (row, id, text, source) VALUES (?, ?, ?, ?)",
+            [
+                (row, chunk_id, text, source)
+                for row, (chunk_id, (_vector, text, source)) in enumerate(items)
+            ],
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,192 @@
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+from app.db.models import TicketMessage
+from app.services.tokens import count_tokens
+
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+
+
+@dataclass
+class PromptParts:
+    system_prompt: str
+    tokens: Dict[str, int]
+    chunk_ids: List[str] = field(default_factory=list)
+    dropped_chunks: int = 0
+    dropped_messages: int = 0
+
+
+class PromptBuilder:
+    """Assemble the system prompt within a token budget.
+
+    Retrieved chunks are de-duplicated by id and by word-shingle overlap with
+    chunks already kept, then added in rank order up to ``context_tokens``.
+    History fills what is left of ``budget``, newest messages first; older
+    messages that do not fit are dropped. A ticket summary, when given, is
+    placed before the history and counted first.
+    """
+
+    def __init__(
+        self,
+        budget: int = 4000,
+        context_tokens: int = 1500,
+        dedup_threshold: float = 0.6,
+    ) -> None:
+        self.budget = budget
+        self.context_tokens = context_tokens
+        self.dedup_threshold = dedup_threshold
+
+    @classmethod
+    def from_env(cls) -> "PromptBuilder":
+        return cls(
+            budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "4000")),
+            context_tokens=int(os.getenv("PROMPT_CONTEXT_TOKENS", "1500")),
+            dedup_threshold=float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.6")),
+        )
+
+    def count(
+        self,
+        instructions: str,
+        history: Sequence[TicketMessage],
+        summary: Optional[str] = None,
+        user_text: str = "",
+    ) -> int:
+        """Tokens ``build`` would spend on everything but retrieved context."""
+        total = (
+            count_tokens(instructions)
+            + count_tokens(_summary_block(summary))
+            + count_tokens(user_text)
+        )
+        return total + sum(count_tokens(format_message(item)) for item in history)
+
+    def build(
+        self,
+        instructions: str,
+        history: Sequence[TicketMessage],
+        hits: Sequence[Dict[str, object]],
+        user_text: str,
+        summary: Optional[str] = None,
+    ) -> PromptParts:
+        summary_block = _summary_block(summary)
+        tokens = {
+            "instructions": count_tokens(instructions),
+            "summary": count_tokens(summary_block),
+            "user": count_tokens(user_text),
+        }
+
+        unique = self._deduplicate(hits)
+        context_lines: List[str] = []
+        chunk_ids: List[str] = []
+        context_used = 0
+        context_limit = min(
+            self.context_tokens,
+            max(0, self.budget - sum(tokens.values())),
+        )
+        for hit in unique:
+            line = f"Source: {hit.get('source') or 'unknown'}\n{hit.get('text')}"
+            cost = count_tokens(line)
+            if context_used + cost > context_limit:
+                continue
+            context_lines.append(line)
+            chunk_ids.append(str(hit.get("id")))
+            context_used += cost
+        tokens["context"] = context_used
+
+        history_limit = max(0, self.budget - sum(tokens.values()))
+        history_lines: List[str] = []
+        history_used = 0
+        for item in reversed(history):
+            line = format_message(item)
+            cost = count_tokens(line)
+            if history_used + cost > history_limit:
+                break
+            history_lines.append(line)
+            history_used += cost
+        history_lines.reverse()
+        dropped_messages = len(history) - len(history_lines)
+        if dropped_messages:
+            history_lines.insert(
+                0, f"({dropped_messages} earlier messages omitted)"
+            )
+        tokens["history"] = history_used
+
+        blocks = [instructions]
+        if summary_block:
+            blocks.append(summary_block)
+        if history_lines:
+            blocks.append("Conversation history:\n" + "\n".join(history_lines))
+        if context_lines:
+            blocks.append("Relevant context:\n" + "\n\n".join(context_lines))
+        parts = PromptParts(
+            system_prompt="\n\n".join(blocks),
+            tokens=tokens,
+            chunk_ids=chunk_ids,
+            dropped_chunks=len(hits) - len(chunk_ids),
+            dropped_messages=dropped_messages,
+        )
+        logger.info(
+            "Prompt assembled: instructions=%s summary=%s history=%s context=%s "
+            "user=%s total=%s budget=%s dropped_chunks=%s dropped_messages=%s",
+            tokens["instructions"],
+            tokens["summary"],
+            tokens["history"],
+            tokens["context"],
+            tokens["user"],
+            sum(tokens.values()),
+            self.budget,
+            parts.dropped_chunks,
+            parts.dropped_messages,
+        )
+        return parts
+
+    def _deduplicate(
+        self, hits: Sequence[Dict[str, object]]
+    ) -> List[Dict[str, object]]:
+        seen_ids: Set[str] = set()
+        seen_shingles: Set[tuple] = set()
+        unique: List[Dict[str, object]] = []
+        for hit in hits:
+            chunk_id = str(hit.get("id"))
+            text = str(hit.get("text") or "")
+            if not text or chunk_id in seen_ids:
+                continue
+            shingles = _shingles(text)
+            if shingles:
+                overlap = len(shingles & seen_shingles) / len(shingles)
+                if overlap >= self.dedup_threshold:
+                    continue
+            seen_ids.add(chunk_id)
+            seen_shingles |= shingles
+            unique.append(hit)
+        return unique
+
+
+def _summary_block(summary: Optional[str]) -> str:
+    return f"Conversation summary:\n{summary}" if summary else ""
+
+
+def format_message(item: TicketMessage) -> str:
+    if item.role == "user":
+        role = "User"
+    elif item.role == "assistant":
+        role = "Assistant"
+    else:
+        role = "System"
+    return f"{role}: {item.content}"
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {
+        tuple(words[index : index + SHINGLE_SIZE])
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
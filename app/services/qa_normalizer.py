@@ -1,8 +1,8 @@
 import json
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Tuple
 
-from app.services.gpt_client import GPTClient
+from app.services.gpt_client import GPTClient, GPTMeta
 
 
 @dataclass(frozen=True)
@@ -25,13 +25,29 @@ SYSTEM_PROMPT = (
 )
 
 
-async def normalize_text_to_pairs(text: str) -> List[QAPair]:
-    client = GPTClient()
-    output, _meta = await client.chat(user_text=text, system_prompt=SYSTEM_PROMPT)
+async def normalize_text_to_pairs(
+    text: str,
+    client: Optional[GPTClient] = None,
+) -> List[QAPair]:
+    pairs, _meta = await normalize_text_with_meta(text, client)
+    return pairs
+
+
+async def normalize_text_with_meta(
+    text: str,
+    client: Optional[GPTClient] = None,
+) -> Tuple[List[QAPair], GPTMeta]:
+    owned = client is None
+    client = client or GPTClient()
+    try:
+        output, meta = await client.chat(user_text=text, system_prompt=SYSTEM_PROMPT)
+    finally:
+        if owned:
+            await client.close()
     pairs = _parse_pairs(output)
-    if pairs:
-        return pairs
-    return _parse_pairs_from_json(output)
+    if not pairs:
+        pairs = _parse_pairs_from_json(output)
+    return pairs, meta
 
 
 def _parse_pairs(output: str) -> List[QAPair]:
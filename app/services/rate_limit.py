@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate`` tokens per second.
+
+    ``acquire`` waits until enough tokens are available. Requests larger than
+    the capacity are allowed once the bucket is full, so they cannot stall.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        return cls(rate=limit / 60.0, capacity=limit)
+
+    async def acquire(self, amount: float) -> float:
+        """Take ``amount`` tokens and return how long the caller waited."""
+        amount = min(amount, self._capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self._rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+
+
+class CallLimiter:
+    """Cap concurrent API calls and, optionally, their rate per minute.
+
+    Waiters on the semaphore are woken in arrival order, so bursts from one
+    chat cannot starve calls from others.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float = 0) -> None:
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = (
+            TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        )
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.calls = 0
+        self.waited_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str, default_concurrency: int) -> "CallLimiter":
+        return cls(
+            max_concurrency=int(
+                os.getenv(f"{prefix}_CONCURRENCY", str(default_concurrency))
+            ),
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM", "0")),
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        started = time.monotonic()
+        async with self._semaphore:
+            if self._bucket is not None:
+                await self._bucket.acquire(1)
+            waited = time.monotonic() - started
+            self.calls += 1
+            self.waited_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "avg_wait_ms": round(1000 * self.waited_seconds / self.calls, 1)
+            if self.calls
+            else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seconds, 1),
+        }
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+async def with_backoff(
+    call: Callable[[], Awaitable[T]],
+    attempts: Optional[int] = None,
+    base_delay: Optional[float] = None,
+    max_delay: float = 60.0,
+) -> T:
+    """Run ``call`` and retry rate-limit and transient API errors.
+
+    Delays grow exponentially with full jitter; the last error is re-raised.
+    """
+    attempts = attempts or int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+    base_delay = base_delay or float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "1.0"))
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except RETRYABLE_ERRORS as exc:
+            if attempt == attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            logger.warning(
+                "OpenAI call failed, retrying: attempt=%s/%s delay=%.1fs error=%s",
+                attempt,
+                attempts,
+                delay,
+                type(exc).__name__,
+            )
+            await asyncio.sleep(delay)
+    raise RuntimeError("unreachable")
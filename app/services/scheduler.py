@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Generic, List, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ChatQueueFull(Exception):
+    pass
+
+
+@dataclass
+class _Pending(Generic[T]):
+    item: T
+    enqueued_at: float
+    future: "asyncio.Future[None]"
+
+
+class ChatScheduler:
+    """Run turns one at a time per chat, fairly across chats.
+
+    Each chat has a FIFO queue drained by its own worker, so a chat never has
+    two turns in flight. Workers share ``max_active_chats`` slots; the
+    semaphore wakes waiters in arrival order, so a chat that queued many
+    messages only takes one slot at a time and cannot starve the others.
+
+    With ``coalesce_seconds`` > 0 the worker waits that long for the chat to
+    go quiet, then hands every queued item to the handler as a single turn.
+    """
+
+    def __init__(
+        self,
+        max_active_chats: int = 16,
+        coalesce_seconds: float = 0.0,
+        max_queue_per_chat: int = 10,
+    ) -> None:
+        self._slots = asyncio.Semaphore(max_active_chats)
+        self._coalesce = coalesce_seconds
+        self._max_queue = max_queue_per_chat
+        self._queues: Dict[Any, Deque[_Pending]] = {}
+        self._workers: Dict[Any, asyncio.Task] = {}
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.max_active_chats = max_active_chats
+        self.active = 0
+        self.turns = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "ChatScheduler":
+        return cls(
+            max_active_chats=int(os.getenv("SCHEDULER_MAX_ACTIVE_CHATS", "16")),
+            coalesce_seconds=float(os.getenv("SCHEDULER_COALESCE_SECONDS", "0")),
+            max_queue_per_chat=int(os.getenv("SCHEDULER_MAX_QUEUE_PER_CHAT", "10")),
+        )
+
+    def enqueue(
+        self,
+        chat_id: Any,
+        item: T,
+        handler: Callable[[List[T]], Awaitable[None]],
+    ) -> "asyncio.Future[None]":
+        """Queue ``item`` for ``chat_id``; the future resolves after its turn.
+
+        Raises ``ChatQueueFull`` when the chat already has
+        ``max_queue_per_chat`` items waiting. Handler errors are logged, not
+        set on the future.
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+        if len(queue) >= self._max_queue:
+            self.rejected += 1
+            raise ChatQueueFull(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        queue.append(_Pending(item, time.monotonic(), future))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id, handler))
+        return future
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self._waits)
+        return {
+            "chats": len(self._workers),
+            "active": self.active,
+            "queued": self.queue_depth(),
+            "turns": self.turns,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "wait_p50_ms": round(1000 * waits[len(waits) // 2], 1) if waits else 0.0,
+            "wait_p95_ms": round(1000 * waits[int(len(waits) * 0.95)], 1)
+            if waits
+            else 0.0,
+        }
+
+    async def close(self) -> None:
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _drain(
+        self,
+        chat_id: Any,
+        handler: Callable[[List[T]], Awaitable[None]],
+    ) -> None:
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                if self._coalesce:
+                    await self._wait_until_quiet(queue)
+                async with self._slots:
+                    batch = [queue.popleft()]
+                    if self._coalesce:
+                        while queue:
+                            batch.append(queue.popleft())
+                    await self._run(chat_id, batch, handler)
+        finally:
+            self._workers.pop(chat_id, None)
+            self._queues.pop(chat_id, None)
+            for pending in queue:
+                if not pending.future.done():
+                    pending.future.cancel()
+
+    async def _wait_until_quiet(self, queue: Deque[_Pending]) -> None:
+        while True:
+            size = len(queue)
+            await asyncio.sleep(self._coalesce)
+            if len(queue) == size:
+                return
+
+    async def _run(
+        self,
+        chat_id: Any,
+        batch: List[_Pending],
+        handler: Callable[[List[T]], Awaitable[None]],
+    ) -> None:
+        wait = time.monotonic() - batch[0].enqueued_at
+        self._waits.append(wait)
+        self.turns += 1
+        self.coalesced += len(batch) - 1
+        self.active += 1
+        logger.info(
+            "Turn started: chat_id=%s items=%s wait_ms=%s queued=%s active=%s",
+            chat_id,
+            len(batch),
+            int(wait * 1000),
+            self.queue_depth(),
+            self.active,
+        )
+        try:
+            await handler([pending.item for pending in batch])
+        except Exception:
+            logger.exception("Turn failed: chat_id=%s", chat_id)
+        finally:
+            self.active -= 1
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_result(None)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Sequence
+
+from app.db import (
+    get_read_session,
+    get_session,
+    get_ticket_messages,
+    get_ticket_summary,
+    save_ticket_summary,
+)
+from app.db.models import TicketMessage, TicketSummary
+from app.services.gpt_client import GPTClient
+from app.services.prompt_builder import format_message
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a customer support conversation. "
+    "Merge the previous summary with the new messages into one updated summary "
+    "of at most {max_words} words. Keep the user's problem, details they gave "
+    "(product names, codes, versions, steps tried), answers already given and "
+    "open questions. Write plain text in the conversation's language."
+)
+
+
+def unsummarized(
+    history: Sequence[TicketMessage],
+    summary: Optional[TicketSummary],
+) -> List[TicketMessage]:
+    """Messages newer than the part of the ticket the summary covers."""
+    if summary is None:
+        return list(history)
+    return [item for item in history if item.id > summary.last_message_id]
+
+
+class TicketSummarizer:
+    """Fold older ticket messages into a stored summary in the background.
+
+    Once a ticket has ``threshold`` messages past its summary, or the prompt
+    they produce reaches ``token_threshold`` tokens, everything but the
+    newest ``keep_recent`` of them is merged into the summary by one LLM
+    call. At most one refresh runs per ticket.
+    """
+
+    def __init__(
+        self,
+        gpt: GPTClient,
+        threshold: int = 12,
+        keep_recent: int = 4,
+        max_words: int = 150,
+        token_threshold: int = 0,
+    ) -> None:
+        self._gpt = gpt
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.token_threshold = token_threshold
+        self._max_words = max_words
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @classmethod
+    def from_env(
+        cls,
+        gpt: GPTClient,
+        token_threshold: int = 0,
+    ) -> Optional["TicketSummarizer"]:
+        if os.getenv("SUMMARY_ENABLED", "1") != "1":
+            return None
+        return cls(
+            gpt=gpt,
+            threshold=int(os.getenv("SUMMARY_THRESHOLD", "12")),
+            keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "4")),
+            max_words=int(os.getenv("SUMMARY_MAX_WORDS", "150")),
+            token_threshold=int(
+                os.getenv("SUMMARY_TOKEN_THRESHOLD", str(token_threshold))
+            ),
+        )
+
+    def maybe_refresh(
+        self,
+        ticket_id: int,
+        pending_messages: int,
+        prompt_tokens: int = 0,
+    ) -> None:
+        """Start a refresh if the ticket passed either threshold.
+
+        ``prompt_tokens`` is the size of the next prompt without retrieved
+        context (``PromptBuilder.count``), system prompt included.
+        """
+        over_tokens = (
+            self.token_threshold > 0
+            and prompt_tokens >= self.token_threshold
+            and pending_messages > self.keep_recent
+        )
+        if pending_messages < self.threshold and not over_tokens:
+            return
+        if ticket_id in self._tasks:
+            return
+        task = asyncio.create_task(self._refresh(ticket_id))
+        self._tasks[ticket_id] = task
+        task.add_done_callback(lambda _task: self._tasks.pop(ticket_id, None))
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _refresh(self, ticket_id: int) -> None:
+        try:
+            async with get_read_session() as session:
+                summary = await get_ticket_summary(session, ticket_id)
+                messages = await get_ticket_messages(
+                    session,
+                    ticket_id,
+                    after_id=summary.last_message_id if summary else None,
+                )
+            if self.keep_recent:
+                messages = messages[: -self.keep_recent]
+            if not messages:
+                return
+            parts = []
+            if summary is not None:
+                parts.append(f"Previous summary:\n{summary.content}")
+            parts.append(
+                "New messages:\n" + "\n".join(format_message(item) for item in messages)
+            )
+            content, meta = await self._gpt.chat(
+                user_text="\n\n".join(parts),
+                system_prompt=SUMMARY_PROMPT.format(max_words=self._max_words),
+            )
+            content = content.strip()
+            if not content:
+                return
+            async with get_session() as session:
+                await save_ticket_summary(session, ticket_id, content, messages[-1].id)
+            logger.info(
+                "Ticket summary refreshed: ticket_id=%s folded=%s last_message_id=%s "
+                "total_tokens=%s",
+                ticket_id,
+                len(messages),
+                messages[-1].id,
+                meta.get("total_tokens"),
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ticket summary refresh failed: ticket_id=%s", ticket_id)
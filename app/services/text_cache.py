@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedTextCache:
+    """On-disk cache of extracted document text.
+
+    Entries are keyed by absolute path, size, mtime, SHA-256 of the file and
+    the parser version, and the text is stored zlib-compressed in SQLite.
+    A matching size and mtime is trusted without reading the file; otherwise
+    the file is hashed, so touched or renamed files with the same content
+    still hit. ``refresh`` ignores stored entries but writes new ones.
+    """
+
+    def __init__(self, path: str, parser_version: str, refresh: bool = False) -> None:
+        self._path = path
+        self._parser_version = parser_version
+        self._refresh = refresh
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Digests computed during a missed lookup, reused by the following put.
+        self._digests: Dict[str, str] = {}
+        self.hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        self.bytes_text = 0
+        self.bytes_stored = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        parser_version: str,
+        refresh: bool = False,
+    ) -> Optional["ParsedTextCache"]:
+        path = os.getenv("PARSE_CACHE_PATH", "./data/cache/parsed_text.db")
+        if not path:
+            return None
+        return cls(path, parser_version, refresh=refresh)
+
+    def get(self, path: str) -> Optional[str]:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if self._refresh:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT size, mtime_ns, text FROM parsed_text "
+                "WHERE path = ? AND parser_version = ?",
+                (path, self._parser_version),
+            ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return zlib.decompress(row[2]).decode("utf-8")
+
+        digest = file_digest(path)
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                "SELECT text FROM parsed_text "
+                "WHERE digest = ? AND parser_version = ? LIMIT 1",
+                (digest, self._parser_version),
+            ).fetchone()
+            if row is None:
+                self._digests[path] = digest
+                self.misses += 1
+                return None
+            self._write(conn, path, stat, digest, row[0])
+        self.content_hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, path: str, text: str) -> None:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = self._digests.pop(path, None) or file_digest(path)
+        raw = text.encode("utf-8")
+        blob = zlib.compress(raw, 6)
+        self.bytes_text += len(raw)
+        self.bytes_stored += len(blob)
+        with self._lock:
+            self._write(self._get_conn(), path, stat, digest, blob)
+
+    def prune_missing(self) -> int:
+        """Drop entries whose file no longer exists."""
+        with self._lock:
+            conn = self._get_conn()
+            paths = [row[0] for row in conn.execute("SELECT path FROM parsed_text")]
+            missing = [(path,) for path in paths if not os.path.exists(path)]
+            conn.executemany("DELETE FROM parsed_text WHERE path = ?", missing)
+            conn.commit()
+        return len(missing)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "content_hits": self.content_hits,
+            "misses": self.misses,
+            "refresh": int(self._refresh),
+            "stored_kb": self.bytes_stored // 1024,
+            "text_kb": self.bytes_text // 1024,
+        }
+
+    def close(self) -> None:
+        logger.info("Parse cache stats: %s", self.stats())
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _write(
+        self,
+        conn: sqlite3.Connection,
+        path: str,
+        stat: os.stat_result,
+        digest: str,
+        blob: bytes,
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO parsed_text "
+            "(path, size, mtime_ns, digest, parser_version, text, stored_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                stat.st_size,
+                stat.st_mtime_ns,
+                digest,
+                self._parser_version,
+                blob,
+                time.time(),
+            ),
+        )
+        conn.commit()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The loader is advanced from worker threads, one call at a time.
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parsed_text ("
+                "path TEXT PRIMARY KEY, "
+                "size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, "
+                "digest TEXT NOT NULL, "
+                "parser_version TEXT NOT NULL, "
+                "text BLOB NOT NULL, "
+                "stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_parsed_text_digest "
+                "ON parsed_text (digest, parser_version)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
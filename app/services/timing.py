@@ -0,0 +1,30 @@
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Dict, TypeVar
+
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """Wall-clock duration per named stage, in milliseconds."""
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def measure(self, name: str) -> AsyncIterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.durations[name] = int((time.monotonic() - start) * 1000)
+
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        async with self.measure(name):
+            return await awaitable
+
+    def format(self) -> str:
+        return " ".join(
+            f"{name}={duration}ms" for name, duration in self.durations.items()
+        )
@@ -0,0 +1,47 @@
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    tiktoken = None
+
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token)."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_tokens(text: str) -> int:
+    """Exact token count with tiktoken; the estimate only if it cannot load."""
+    if not text:
+        return 0
+    encoding = _get_encoding(os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+    if tiktoken is None:
+        logger.warning("tiktoken is not installed, token counts are estimated")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:
+        logger.warning("Tokenizer unavailable, using estimate: error=%s", exc)
+        return None
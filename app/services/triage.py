@@ -12,3 +12,36 @@ def strip_agent_marker(answer: str) -> str:
         line for line in answer.splitlines() if MARKER.lower() not in line.lower()
     ]
     return "\n".join(cleaned_lines).strip()
+
+
+class MarkerFilter:
+    """Remove the marker from streamed text without leaking a partial marker."""
+
+    def __init__(self) -> None:
+        self._pending = ""
+
+    def feed(self, delta: str) -> str:
+        text = self._pending + delta
+        marker = MARKER.lower()
+        output = []
+        while True:
+            idx = text.lower().find(marker)
+            if idx == -1:
+                break
+            output.append(text[:idx])
+            text = text[idx + len(marker) :]
+        hold = _partial_marker_suffix(text.lower(), marker)
+        if hold:
+            output.append(text[:-hold])
+            self._pending = text[-hold:]
+        else:
+            output.append(text)
+            self._pending = ""
+        return "".join(output)
+
+
+def _partial_marker_suffix(text: str, marker: str) -> int:
+    for size in range(min(len(text), len(marker) - 1), 0, -1):
+        if text.endswith(marker[:size]):
+            return size
+    return 0
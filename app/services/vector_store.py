@@ -0,0 +1,166 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Protocol, Set
+
+
+@dataclass(frozen=True)
+class ChunkRecord:
+    embedding: List[float]
+    text: str
+    source: str
+    chunk_id: Optional[str] = None
+
+
+class VectorStore(Protocol):
+    """Operations the bot and the ingest pipeline need from a vector store.
+
+    Writes go to the version opened by ``begin_version`` and become visible
+    to readers only after ``activate_version``.
+    """
+
+    async def ensure_collection(self, drop_existing: bool = False) -> None: ...
+
+    async def insert_chunks(self, records: Iterable[ChunkRecord]) -> List[str]: ...
+
+    async def list_ids(self) -> Set[str]: ...
+
+    async def search(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+    ) -> List[Dict[str, object]]: ...
+
+    async def search_many(
+        self,
+        embeddings: List[List[float]],
+        top_k: int = 5,
+    ) -> List[List[Dict[str, object]]]: ...
+
+    async def begin_version(
+        self,
+        copy_live: bool = True,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> str: ...
+
+    async def activate_version(self, expected_count: Optional[int] = None) -> str: ...
+
+    async def abort_version(self) -> None: ...
+
+    async def collect_garbage(self, grace_seconds: float) -> List[str]: ...
+
+    def live_version(self) -> str: ...
+
+    def index_version(self) -> str: ...
+
+    def mark_indexed(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+def get_vector_backend() -> str:
+    return os.getenv("VECTOR_BACKEND", "chroma")
+
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    backend = backend or get_vector_backend()
+    if backend == "chroma":
+        from app.services.chroma_store import ChromaStore
+
+        return ChromaStore()
+    if backend == "numpy":
+        from app.services.numpy_store import NumpyStore
+
+        return NumpyStore()
+    raise RuntimeError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+class VersionAliases:
+    """``aliases.json`` pointer from a base collection name to its live version.
+
+    The file is replaced atomically, so readers see either the old or the new
+    pointer. Readers watch its mtime to notice a swap.
+    """
+
+    def __init__(self, directory: str, base_name: str) -> None:
+        self._directory = directory
+        self._base_name = base_name
+        self._seen: Optional[int] = None
+        self._seen_live: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self._directory, "aliases.json")
+
+    def mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def live_name(self) -> Optional[str]:
+        return self._entry(self._read()).get("live")
+
+    def watch_live_name(self) -> Optional[str]:
+        """``live_name`` for query paths: re-read only when the mtime changes."""
+        mtime = self.mtime()
+        if mtime != self._seen:
+            self._seen_live = self.live_name()
+            self._seen = mtime
+        return self._seen_live
+
+    def allocate_version(self) -> str:
+        data = self._read()
+        entry = self._entry(data)
+        version = int(entry.get("next_version", 1))
+        entry["next_version"] = version + 1
+        self._write(data)
+        return f"{self._base_name}-v{version}"
+
+    def activate(self, name: str, previous: Optional[str]) -> None:
+        data = self._read()
+        entry = self._entry(data)
+        entry["live"] = name
+        retired = entry.setdefault("retired", [])
+        if previous and previous != name:
+            retired.append({"name": previous, "retired_at": time.time()})
+        self._write(data)
+
+    def expired(self, grace_seconds: float) -> List[str]:
+        entry = self._entry(self._read())
+        cutoff = time.time() - grace_seconds
+        return [
+            item["name"]
+            for item in entry.get("retired", [])
+            if item["retired_at"] <= cutoff and item["name"] != entry.get("live")
+        ]
+
+    def forget(self, names: List[str]) -> None:
+        if not names:
+            return
+        data = self._read()
+        entry = self._entry(data)
+        entry["retired"] = [
+            item for item in entry.get("retired", []) if item["name"] not in names
+        ]
+        self._write(data)
+
+    def _entry(self, data: Dict[str, Dict]) -> Dict:
+        return data.setdefault(self._base_name, {})
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, data: Dict[str, Dict]) -> None:
+        os.makedirs(self._directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+ROUTED_HEADER = "X-Bot-Routed-By"
+
+
+def get_route_port() -> int:
+    default = int(os.getenv("WEBHOOK_PORT", "8080")) + 1000
+    return int(os.getenv("WEBHOOK_ROUTE_PORT", str(default)))
+
+
+def update_chat_id(update: Dict[str, Any]) -> Optional[int]:
+    """Chat an update belongs to, or the sender for updates without a chat."""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for holder in (event, event.get("message")):
+            if isinstance(holder, dict) and isinstance(holder.get("chat"), dict):
+                return holder["chat"].get("id")
+        sender = event.get("from") or event.get("user")
+        if isinstance(sender, dict):
+            return sender.get("id")
+    return None
+
+
+class ChatRoutingRequestHandler(SimpleRequestHandler):
+    """Webhook handler that sends every update of a chat to one worker.
+
+    Worker ``index`` of ``workers`` also listens on
+    ``127.0.0.1:route_port + index`` and owns the chats with
+    ``chat_id % workers == index``. Updates for other chats are posted to
+    their owner and the owner's response is relayed to Telegram, so all turns
+    of a chat queue in one ``ChatScheduler`` and run in order. If the owner
+    cannot be reached, the update is handled locally and the order of that
+    chat is no longer guaranteed.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        index: int,
+        workers: int,
+        route_port: int,
+        path: str,
+        secret_token: Optional[str] = None,
+    ) -> None:
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=False,
+            secret_token=secret_token,
+        )
+        self._index = index
+        self._workers = workers
+        self._route_port = route_port
+        self._path = path
+        self._session: Optional[ClientSession] = None
+        self.forwarded = 0
+        self.fallbacks = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self._workers > 1 and ROUTED_HEADER not in request.headers:
+            if not self.verify_secret(request.headers.get(SECRET_HEADER, ""), self.bot):
+                return web.Response(body="Unauthorized", status=401)
+            body = await request.read()
+            owner = self._owner(body)
+            if owner is not None and owner != self._index:
+                response = await self._forward(request, body, owner)
+                if response is not None:
+                    return response
+        # aiohttp caches the body, so the dispatcher can read it again.
+        return await super().handle(request)
+
+    async def close(self) -> None:
+        if self._workers > 1:
+            logger.info(
+                "Update routing stats: worker=%s forwarded=%s fallbacks=%s",
+                self._index,
+                self.forwarded,
+                self.fallbacks,
+            )
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await super().close()
+
+    def _owner(self, body: bytes) -> Optional[int]:
+        try:
+            chat_id = update_chat_id(json.loads(body))
+        except (ValueError, AttributeError):
+            return None
+        if not isinstance(chat_id, int):
+            return None
+        return chat_id % self._workers
+
+    async def _forward(
+        self,
+        request: web.Request,
+        body: bytes,
+        owner: int,
+    ) -> Optional[web.Response]:
+        if self._session is None:
+            self._session = ClientSession(timeout=ClientTimeout(total=60))
+        url = f"http://127.0.0.1:{self._route_port + owner}{self._path}"
+        headers = {
+            "Content-Type": request.content_type,
+            SECRET_HEADER: request.headers.get(SECRET_HEADER, ""),
+            ROUTED_HEADER: str(self._index),
+        }
+        try:
+            async with self._session.post(url, data=body, headers=headers) as response:
+                payload = await response.read()
+                content_type = response.headers.get("Content-Type", "text/plain")
+                status = response.status
+        except (ClientError, asyncio.TimeoutError) as exc:
+            self.fallbacks += 1
+            logger.warning(
+                "Update routing failed, handling locally: owner=%s error=%r",
+                owner,
+                exc,
+            )
+            return None
+        self.forwarded += 1
+        return web.Response(
+            body=payload,
+            status=status,
+            headers={"Content-Type": content_type},
+        )
@@ -0,0 +1,69 @@
+"""Compare serial and pooled document parsing on a docs folder.
+
+Each worker count runs in a fresh process so peak memory is measured per run.
+Reports wall time, documents and characters per second, and the peak RSS of
+the parent process and of the worker processes.
+
+Usage:
+    python scripts/bench_doc_parser.py --docs data/docs --workers 1 4 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.doc_parser import load_documents_from_dir  # noqa: E402
+
+
+def measure(docs: str, workers: int) -> dict:
+    started = time.monotonic()
+    count = 0
+    chars = 0
+    for document in load_documents_from_dir(docs, workers=workers):
+        count += 1
+        chars += len(document.text)
+    elapsed = time.monotonic() - started
+    return {
+        "workers": workers,
+        "docs": count,
+        "chars": chars,
+        "seconds": round(elapsed, 2),
+        "docs_per_sec": round(count / elapsed, 2) if elapsed else 0.0,
+        "chars_per_sec": int(chars / elapsed) if elapsed else 0,
+        "parent_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", default="./data/docs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.docs, args.child)))
+        return
+
+    print(f"cpus={os.cpu_count()} docs={args.docs}")
+    for workers in args.workers:
+        output = subprocess.run(
+            [sys.executable, __file__, "--docs", args.docs, "--child", str(workers)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare ticket-store throughput for the default and production SQLite profiles.
+
+Usage:
+    python scripts/bench_sqlite.py --users 50 --turns 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+from app.db.crud import (  # noqa: E402
+    TicketUnitOfWork,
+    add_ticket_message,
+    create_ticket,
+    get_open_ticket,
+    get_ticket_messages,
+)
+from app.db.database import create_engine  # noqa: E402
+from app.db.models import Base  # noqa: E402
+
+
+async def simulate_user(user_id, turns, write_sessions, read_sessions, errors):
+    for turn in range(turns):
+        try:
+            async with read_sessions() as session:
+                ticket = await get_open_ticket(session, user_id)
+                if ticket:
+                    await get_ticket_messages(session, ticket.id, limit=20)
+            if not ticket:
+                async with write_sessions() as session:
+                    ticket = await create_ticket(session, user_id)
+            async with write_sessions() as session:
+                await add_ticket_message(session, ticket.id, "user", f"q{turn}")
+            async with write_sessions() as session:
+                work = TicketUnitOfWork(session)
+                work.add_message(ticket.id, "assistant", f"a{turn}")
+                await work.commit()
+        except Exception as exc:
+            errors.append(exc)
+
+
+async def run_profile(profile, users, turns, directory):
+    path = os.path.join(directory, f"{profile}.db")
+    url = f"sqlite+aiosqlite:///{path}"
+    engine = create_engine(url, profile=profile)
+    if profile == "production":
+        read_engine = create_engine(url, profile=profile, read_only=True)
+    else:
+        read_engine = engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    write_sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    read_sessions = async_sessionmaker(bind=read_engine, expire_on_commit=False)
+
+    errors = []
+    start = time.monotonic()
+    await asyncio.gather(
+        *[
+            simulate_user(user_id, turns, write_sessions, read_sessions, errors)
+            for user_id in range(users)
+        ]
+    )
+    elapsed = time.monotonic() - start
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
+
+    total = users * turns
+    print(
+        f"{profile:>10}: turns={total} elapsed={elapsed:.2f}s "
+        f"throughput={total / elapsed:.1f} turns/s errors={len(errors)}"
+    )
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in ("default", "production"):
+            await run_profile(profile, args.users, args.turns, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
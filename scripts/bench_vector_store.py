@@ -0,0 +1,126 @@
+"""Compare query latency and memory of the Chroma and NumPy vector backends.
+
+Each backend runs in its own subprocess on the same random corpus, so the
+reported peak RSS covers only that backend. ``incremental`` is the time of an
+incremental re-index that replaces 1% of the chunks: the unchanged vectors
+are carried into a new version, the new ones are inserted and it is activated.
+
+Usage:
+    python scripts/bench_vector_store.py --chunks 5000 --dim 1536 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.services.vector_store import ChunkRecord, create_vector_store  # noqa: E402
+
+
+BACKENDS = ("chroma", "numpy")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_backend(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    corpus = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    store = create_vector_store(args.backend)
+    await store.ensure_collection(drop_existing=True)
+    await store.begin_version(copy_live=False)
+    start = time.monotonic()
+    for offset in range(0, args.chunks, 1000):
+        await store.insert_chunks(
+            ChunkRecord(
+                embedding=corpus[row].tolist(),
+                text=f"chunk {row}",
+                source="bench",
+                chunk_id=f"c{row}",
+            )
+            for row in range(offset, min(offset + 1000, args.chunks))
+        )
+    await store.activate_version(expected_count=args.chunks)
+    index_seconds = time.monotonic() - start
+
+    latencies = []
+    for query in queries:
+        began = time.perf_counter()
+        await store.search(query.tolist(), top_k=args.top_k)
+        latencies.append((time.perf_counter() - began) * 1000)
+
+    changed = max(1, args.chunks // 100)
+    start = time.monotonic()
+    await store.begin_version(skip_ids={f"c{row}" for row in range(changed)})
+    await store.insert_chunks(
+        ChunkRecord(
+            embedding=corpus[row].tolist(),
+            text=f"chunk {row} v2",
+            source="bench",
+            chunk_id=f"n{row}",
+        )
+        for row in range(changed)
+    )
+    await store.activate_version(expected_count=args.chunks)
+    incremental_seconds = time.monotonic() - start
+    await store.close()
+
+    return {
+        "backend": args.backend,
+        "index_s": round(index_seconds, 2),
+        "incremental_s": round(incremental_seconds, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main(args) -> None:
+    if args.backend:
+        print(json.dumps(asyncio.run(run_backend(args))))
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            CHROMA_PATH=os.path.join(directory, "chroma"),
+            NUMPY_STORE_PATH=os.path.join(directory, "vectors"),
+        )
+        for backend in BACKENDS:
+            output = subprocess.run(
+                [sys.executable, __file__, "--backend", backend]
+                + [f"--{key}={getattr(args, key)}" for key in ("chunks", "dim", "queries", "top_k", "seed")],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{backend:>7}: chunks={args.chunks} dim={args.dim} "
+                f"index={result['index_s']}s "
+                f"incremental={result['incremental_s']}s p50={result['p50_ms']}ms "
+                f"p95={result['p95_ms']}ms max_rss={result['max_rss_mb']}MB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""Check that the ticket hot-path queries are served by the composite indexes.
+
+Builds a database with the legacy single-column indexes, runs the
+migrations, then asserts on SQLite EXPLAIN QUERY PLAN output. Exits
+non-zero on any regression.
+
+Usage:
+    python scripts/check_query_plans.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.db.migrations import (  # noqa: E402
+    QUERY_PLAN_CHECKS,
+    apply_migrations,
+    explain_query_plan,
+)
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+CREATE INDEX ix_tickets_user_id ON tickets (user_id);
+CREATE TABLE ticket_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL REFERENCES tickets (id),
+    role VARCHAR(32) NOT NULL,
+    content TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+CREATE INDEX ix_ticket_messages_ticket_id ON ticket_messages (ticket_id);
+"""
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plans.db")
+        conn = sqlite3.connect(path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.close()
+
+        # Migrations verify the plans themselves (DB_QUERY_PLAN_CHECK);
+        # report them here instead of stopping at the first failure.
+        os.environ["DB_QUERY_PLAN_CHECK"] = "off"
+        engine = create_engine(f"sqlite:///{path}")
+        with engine.begin() as connection:
+            apply_migrations(connection)
+            for name, statement, expected in QUERY_PLAN_CHECKS:
+                plan = explain_query_plan(connection, statement)
+                ok = expected in plan and "TEMP B-TREE" not in plan
+                failures += 0 if ok else 1
+                print(f"[{'ok' if ok else 'FAIL'}] {name}: {plan}")
+        engine.dispose()
+
+        conn = sqlite3.connect(path)
+        legacy = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND name IN ('ix_tickets_user_id', 'ix_ticket_messages_ticket_id')"
+        ).fetchall()
+        if legacy:
+            failures += 1
+            print(f"[FAIL] legacy indexes left behind: {legacy}")
+        conn.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Measure recall@k of quantized NumPy vector search against exact search.
+
+Builds one store version per quantization mode from the same vectors and
+compares the returned ids with the exact float32 top-k.
+
+Usage:
+    python scripts/eval_quantization.py --chunks 20000 --dim 1536 --k 5
+    python scripts/eval_quantization.py --vectors data/vectors/faq_chunks-v3/vectors.npy
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.services.numpy_store import (  # noqa: E402
+    QUANTIZATION_BINARY,
+    QUANTIZATION_INT8,
+    QUANTIZATION_NONE,
+    NumpyStore,
+)
+from app.services.vector_store import ChunkRecord  # noqa: E402
+
+
+MODES = (QUANTIZATION_NONE, QUANTIZATION_INT8, QUANTIZATION_BINARY)
+
+
+def load_corpus(args, rng):
+    if args.vectors:
+        corpus = np.load(args.vectors).astype(np.float32)
+    else:
+        # Clustered data behaves more like real embeddings than pure noise.
+        centers = rng.standard_normal((args.clusters, args.dim), dtype=np.float32)
+        labels = rng.integers(0, args.clusters, args.chunks)
+        noise = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+        corpus = centers[labels] + args.spread * noise
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    picks = rng.choice(len(corpus), size=args.queries, replace=False)
+    queries = corpus[picks] + 0.05 * rng.standard_normal(
+        (args.queries, corpus.shape[1]), dtype=np.float32
+    )
+    return corpus, queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def evaluate(mode, corpus, queries, truth, args, directory):
+    store = NumpyStore(
+        path=os.path.join(directory, mode),
+        quantization=mode,
+        rerank_factor=args.rerank_factor,
+    )
+    await store.ensure_collection()
+    await store.begin_version(copy_live=False)
+    await store.insert_chunks(
+        ChunkRecord(embedding=vector, text="", source="eval", chunk_id=str(row))
+        for row, vector in enumerate(corpus)
+    )
+    await store.activate_version(expected_count=len(corpus))
+    segment = store._get_segment()
+    resident = segment.codes if segment.codes is not None else segment.matrix
+    resident_bytes = resident.nbytes + (
+        segment.scales.nbytes if segment.scales is not None else 0
+    )
+
+    found = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        began = time.perf_counter()
+        hits = await store.search(query.tolist(), top_k=args.k)
+        latencies.append((time.perf_counter() - began) * 1000)
+        found += len(expected & {int(hit["id"]) for hit in hits})
+    await store.close()
+    print(
+        f"{mode:>7}: recall@{args.k}={found / (len(queries) * args.k):.3f} "
+        f"p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms "
+        f"resident={resident_bytes / 2**20:.1f}MB "
+        f"({resident_bytes / len(corpus):.0f} B/vector)"
+    )
+
+
+async def main(args):
+    rng = np.random.default_rng(args.seed)
+    corpus, queries = load_corpus(args, rng)
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(corpus @ normalized.T), axis=0)[: args.k]
+    truth = [set(exact[:, column].tolist()) for column in range(len(queries))]
+    print(
+        f"chunks={len(corpus)} dim={corpus.shape[1]} queries={len(queries)} "
+        f"rerank_factor={args.rerank_factor}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            await evaluate(mode, corpus, queries, truth, args, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", help="evaluate on a saved vectors.npy instead")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank_factor", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,313 @@
+"""Load-test the webhook server end to end with fake Telegram and OpenAI APIs.
+
+Starts a local fake Bot API server and a fake OpenAI server, launches
+``python -m app.bot`` in webhook mode against them, then posts generated
+Telegram updates from many chats and waits for every reply. Nothing leaves
+the machine and no API keys are used.
+
+Usage:
+    python scripts/load_test_webhook.py --workers 2 --chats 50 --messages 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from aiohttp import ClientSession, web
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:LOADTEST"
+SECRET = "load-test-secret"
+
+
+class FakeTelegram:
+    """Minimal Bot API: records sends and edits, returns plausible results."""
+
+    def __init__(self) -> None:
+        self.next_message_id = 1000
+        self.replies = defaultdict(list)
+        self.reply_times = {}
+        self.calls = defaultdict(int)
+        # Turns started but not answered yet, per chat; >1 means two turns
+        # of one chat ran at the same time.
+        self.in_flight = defaultdict(int)
+        self.overlaps = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.calls[method] += 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        result = True
+        if method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "bot"}
+        elif method in ("sendmessage", "editmessagetext", "editmessagereplymarkup"):
+            chat_id = int(params.get("chat_id", 0))
+            message_id = int(params.get("message_id") or 0)
+            if method == "sendmessage":
+                self.next_message_id += 1
+                message_id = self.next_message_id
+            # The final answer of a turn is the send/edit that carries the
+            # ticket keyboard (or the escalation notice).
+            text = params.get("text")
+            markup = params.get("reply_markup") or ""
+            if text and ("ticket:" in str(markup) or "needs a specialist" in text):
+                self.replies[chat_id].append(text)
+                self.reply_times[(chat_id, len(self.replies[chat_id]))] = time.monotonic()
+                self.in_flight[chat_id] -= 1
+            elif method == "sendmessage":
+                self.in_flight[chat_id] += 1
+                if self.in_flight[chat_id] > 1:
+                    self.overlaps += 1
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": text or "",
+            }
+        return web.json_response({"ok": True, "result": result})
+
+
+class FakeOpenAI:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.requests = 0
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        question = body["messages"][-1]["content"]
+        answer = f"Echo: {question}"
+        await asyncio.sleep(self.delay)
+        base = {"id": "chatcmpl-load", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            return web.json_response(
+                dict(
+                    base,
+                    object="chat.completion",
+                    choices=[
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": answer},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                )
+            )
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in answer.split(" "):
+            chunk = dict(
+                base,
+                object="chat.completion.chunk",
+                choices=[{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            )
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        usage = dict(
+            base,
+            object="chat.completion.chunk",
+            choices=[],
+            usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        )
+        await response.write(f"data: {json.dumps(usage)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return web.json_response(
+            {
+                "object": "list",
+                "model": body["model"],
+                "data": [
+                    {"object": "embedding", "index": index, "embedding": [0.1] * 8}
+                    for index in range(len(inputs))
+                ],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            }
+        )
+
+
+def make_update(update_id: int, chat_id: int, message_id: int, text: str) -> dict:
+    user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+async def start_site(app: web.Application, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def wait_for_port(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.post(url, json={}) as response:
+                    if response.status in (200, 401, 400, 500):
+                        return
+            except OSError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Webhook server did not start: {url}")
+
+
+async def run(args) -> int:
+    telegram = FakeTelegram()
+    openai = FakeOpenAI(args.llm_delay)
+    telegram_app = web.Application()
+    telegram_app.router.add_post("/bot{token}/{method}", telegram.handle)
+    openai_app = web.Application()
+    openai_app.router.add_post("/v1/chat/completions", openai.chat)
+    openai_app.router.add_post("/v1/embeddings", openai.embeddings)
+    runners = [
+        await start_site(telegram_app, args.telegram_port),
+        await start_site(openai_app, args.openai_port),
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            BOT_TOKEN=TOKEN,
+            BOT_MODE="webhook",
+            WEBHOOK_BASE_URL=f"http://127.0.0.1:{args.port}",
+            WEBHOOK_PORT=str(args.port),
+            WEBHOOK_HOST="127.0.0.1",
+            WEBHOOK_SECRET=SECRET,
+            WEBHOOK_WORKERS=str(args.workers),
+            TELEGRAM_API_URL=f"http://127.0.0.1:{args.telegram_port}",
+            OPENAI_API_KEY="sk-load-test",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{args.openai_port}/v1",
+            DATABASE_URL=f"sqlite+aiosqlite:///{directory}/app.db",
+            DB_PROFILE="production",
+            VECTOR_BACKEND="numpy",
+            NUMPY_STORE_PATH=os.path.join(directory, "vectors"),
+            BM25_INDEX_DIR=os.path.join(directory, "bm25"),
+            EMBED_CACHE_PATH="",
+            SUMMARY_ENABLED="0",
+        )
+        log_path = os.path.join(directory, "bot.out")
+        with open(log_path, "w") as log:
+            bot = subprocess.Popen(
+                [sys.executable, "-m", "app.bot"],
+                cwd=directory,
+                env=dict(env, PYTHONPATH=ROOT),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        url = f"http://127.0.0.1:{args.port}/webhook"
+        try:
+            await wait_for_port(url)
+            result = await fire(url, telegram, args)
+        finally:
+            bot.terminate()
+            try:
+                bot.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+            if args.show_log:
+                with open(log_path) as log:
+                    print(log.read()[-5000:])
+    for runner in runners:
+        await runner.cleanup()
+    return result
+
+
+async def fire(url: str, telegram: FakeTelegram, args) -> int:
+    total = args.chats * args.messages
+    sent_at = {}
+    ack_latencies = []
+    errors = 0
+    update_id = 0
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async def chat_session(session: ClientSession, chat_id: int) -> None:
+        nonlocal update_id, errors
+        for index in range(1, args.messages + 1):
+            update_id += 1
+            update = make_update(update_id, chat_id, index, f"chat {chat_id} question {index}")
+            started = time.monotonic()
+            sent_at[(chat_id, index)] = started
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            ack_latencies.append(time.monotonic() - started)
+            await asyncio.sleep(args.think_time)
+
+    started = time.monotonic()
+    async with ClientSession() as session:
+        await asyncio.gather(
+            *[chat_session(session, 10_000 + chat) for chat in range(args.chats)]
+        )
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            if sum(len(replies) for replies in telegram.replies.values()) >= total:
+                break
+            await asyncio.sleep(0.1)
+    elapsed = time.monotonic() - started
+
+    answered = sum(len(replies) for replies in telegram.replies.values())
+    reply_latencies = [
+        telegram.reply_times[key] - sent_at[key] for key in telegram.reply_times if key in sent_at
+    ]
+    in_order = all(
+        [int(text.split("question ")[-1].split()[0]) for text in replies]
+        == sorted(int(text.split("question ")[-1].split()[0]) for text in replies)
+        for replies in telegram.replies.values()
+    )
+    print(
+        f"workers={args.workers} chats={args.chats} updates={total} "
+        f"answered={answered} errors={errors} elapsed={elapsed:.2f}s "
+        f"throughput={answered / elapsed:.1f} replies/s in_order={in_order} "
+        f"overlapping_turns={telegram.overlaps}"
+    )
+    print(
+        f"webhook ack p50={1000 * percentile(ack_latencies, 50):.1f}ms "
+        f"p95={1000 * percentile(ack_latencies, 95):.1f}ms | "
+        f"reply p50={1000 * percentile(reply_latencies, 50):.0f}ms "
+        f"p95={1000 * percentile(reply_latencies, 95):.0f}ms"
+    )
+    print(f"telegram calls: {dict(telegram.calls)}")
+    ok = answered == total and not errors and in_order and not telegram.overlaps
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--llm-delay", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--openai-port", type=int, default=18082)
+    parser.add_argument("--show-log", action="store_true")
+    sys.exit(asyncio.run(run(parser.parse_args())))